@@ -1,21 +1,139 @@
-from flask import Flask, render_template, redirect, url_for, request, flash, session, abort
+import bisect
+import click
+import csv
+import gzip
+import hashlib
+import io
+import json
+import math
+import multiprocessing
+import os
+import pickle
+import heapq
+import queue
+import random
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta, timezone
+from flask import Flask, Response, make_response, render_template, redirect, url_for, request, flash, session, abort, jsonify, g
+from flask import before_render_template, template_rendered, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
-from sqlalchemy import func
+from werkzeug.middleware.proxy_fix import ProxyFix
+from sqlalchemy import event, func
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm import make_transient_to_detached
+from werkzeug.http import is_resource_modified
 from werkzeug.security import generate_password_hash, check_password_hash
 
+try:
+    import brotli  # optional: pip install brotli to serve br as well as gzip
+except ImportError:
+    brotli = None
+
 app = Flask(__name__)
-app.config['SECRET_KEY'] = 'your_secret_key'  # Change this to a random secret key
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///database.db'
+app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'your_secret_key')  # Set SECRET_KEY in production
+# Only SQLite is supported: the migrations use PRAGMA table_info, INSERT OR IGNORE and FTS5, and
+# some queries use SQLite date functions. DATABASE_URL picks the file (or sqlite:// for memory).
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///database.db')
+# SQLite connection settings, applied by _set_sqlite_pragmas on every new connection.
+# WAL lets readers carry on while a booking is being written, and busy_timeout makes
+# concurrent writers wait their turn instead of failing with "database is locked".
+app.config['SQLITE_JOURNAL_MODE'] = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+app.config['SQLITE_SYNCHRONOUS'] = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')  # durable in WAL mode, fewer fsyncs
+app.config['SQLITE_BUSY_TIMEOUT'] = int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000))  # milliseconds
+app.config['AUTO_MIGRATE'] = os.environ.get('AUTO_MIGRATE') == '1'  # let create_app apply pending migrations (single-process setups)
+
+def database_engine_options(uri):
+    """SQLAlchemy engine options for the configured SQLite database, tunable from the environment"""
+    options = {
+        'pool_pre_ping': True,  # replace connections the server has dropped instead of failing a request
+        'pool_recycle': int(os.environ.get('DATABASE_POOL_RECYCLE', 1800)),  # seconds
+    }
+    # In-memory SQLite uses a single static connection, which takes no pool sizing
+    if not (uri.startswith('sqlite') and (uri in ('sqlite://', 'sqlite:///:memory:') or 'mode=memory' in uri)):
+        options.update({
+            'pool_size': int(os.environ.get('DATABASE_POOL_SIZE', 10)),
+            'max_overflow': int(os.environ.get('DATABASE_MAX_OVERFLOW', 20)),
+            'pool_timeout': int(os.environ.get('DATABASE_POOL_TIMEOUT', 30)),  # seconds to wait for a free connection
+        })
+    return options
+
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = database_engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
 db = SQLAlchemy(app)
 login_manager = LoginManager(app)
 login_manager.login_view = 'login'
 
+@event.listens_for(Engine, 'connect')
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA busy_timeout = {int(app.config['SQLITE_BUSY_TIMEOUT'])}")
+        cursor.execute(f"PRAGMA journal_mode = {app.config['SQLITE_JOURNAL_MODE']}")
+        cursor.execute(f"PRAGMA synchronous = {app.config['SQLITE_SYNCHRONOUS']}")
+        cursor.close()
+
+# Catalogue cache: 'memory' is per process, 'filesystem' is shared by all workers on the host
+app.config['CACHE_TYPE'] = 'memory'
+app.config['CACHE_TTL'] = 300  # seconds
+app.config['CACHE_MAX_ENTRIES'] = 1024
+app.config['CACHE_DIR'] = os.path.join(app.instance_path, 'cache')
+app.config['COMPRESS_MIN_SIZE'] = 500  # bytes; smaller responses aren't worth compressing
+app.config['COMPRESS_LEVEL'] = 6
+app.config['STATIC_MAX_AGE'] = 365 * 24 * 3600  # seconds, for fingerprinted static URLs
+app.config['IDENTITY_CACHE_TTL'] = 30  # seconds a logged-in user or theatre is reused without a query
+app.config['IDENTITY_CACHE_MAX_ENTRIES'] = 4096
+app.config['SEAT_STREAM_POLL_INTERVAL'] = 1.0  # seconds between seat map checks for live subscribers
+app.config['SEAT_STREAM_KEEPALIVE'] = 15  # seconds
+# Each open stream holds a worker thread under sync/threaded servers, so streams end after
+# this many seconds and the browser reconnects; run gunicorn -k gevent for many viewers
+app.config['SEAT_STREAM_MAX_AGE'] = 60  # seconds
+app.config['SEAT_HOLD_TTL'] = 300  # seconds a selected seat stays reserved for the user checking out
+app.config['SEAT_HOLD_MAX_SEATS'] = 10  # per user per showtime
+app.config['DEFAULT_RUNTIME_MINUTES'] = 180  # how long a screen is taken by a movie with no runtime set
+app.config['SCREEN_OPEN_HOUR'] = 9  # day window for the free slots API
+app.config['SCREEN_CLOSE_HOUR'] = 24
+app.config['SCHEDULE_MAX_SHOWTIMES'] = 2000  # per bulk scheduling request
+# Password hashing can run in a small process pool so a burst of sign-ins can't tie up every
+# request thread. The pool spawns processes that re-import the main module, so any script that
+# imports app and signs users in with workers set needs an `if __name__ == '__main__':` guard.
+app.config['PASSWORD_HASH_METHOD'] = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')  # werkzeug method and cost
+# 0 hashes on the request thread, as do debug and testing mode whatever the setting
+app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', 0))
+app.config['PASSWORD_HASH_MAX_PENDING'] = 8  # hashes queued or running at once, per server process
+app.config['PASSWORD_HASH_WAIT'] = 5  # seconds a request waits for a free slot before getting a 503
+# Sign-ins are limited per account first; the per-address limit is a looser backstop against
+# one client trying many accounts, since a whole office or carrier NAT can share one address
+app.config['LOGIN_LIMIT_PER_ACCOUNT'] = (5, 300)  # failed sign-ins per account, per seconds
+app.config['LOGIN_LIMIT_PER_IP'] = (100, 60)  # sign-in attempts per client address, per seconds
+# Reverse proxies in front of the app; their X-Forwarded-For/-Proto headers are trusted so
+# request.remote_addr is the real client. Leave at 0 unless the proxy sets those headers.
+app.config['TRUSTED_PROXIES'] = int(os.environ.get('TRUSTED_PROXIES', 0))
+app.config['ARCHIVE_BATCH_SIZE'] = 500  # bookings per transaction when archiving
+app.config['EXPORT_BATCH_SIZE'] = 1000  # rows fetched and written per chunk of a booking export
+app.config['SEARCH_PER_PAGE'] = 24
+app.config['METRICS_ENABLED'] = True
+app.config['METRICS_SAMPLE_RATE'] = 1.0  # fraction of requests instrumented
+app.config['METRICS_SLOW_QUERIES'] = 20  # slowest statements kept
+app.config['METRICS_TOKEN'] = None  # lets a Prometheus scraper read /admin/metrics/prometheus with a bearer token
+
+if app.config['TRUSTED_PROXIES']:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['TRUSTED_PROXIES'], x_proto=app.config['TRUSTED_PROXIES'])
+
+TICKET_PRICE = 200  # Rs. per seat
+BOOKINGS_PER_PAGE = 50
+
 # Models
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(150), unique=True, nullable=False)
-    password = db.Column(db.String(150), nullable=False)  # This will store the hashed password
+    password = db.Column(db.String(255), nullable=False)  # This will store the hashed password
     username = db.Column(db.String(150), nullable=True)  # Optional display name
 
 class Theatre(db.Model):
@@ -24,7 +142,7 @@ class Theatre(db.Model):
     location = db.Column(db.String(200), nullable=False)
     owner_name = db.Column(db.String(100), nullable=False)
     email = db.Column(db.String(150), unique=True, nullable=False)
-    password = db.Column(db.String(150), nullable=False)
+    password = db.Column(db.String(255), nullable=False)
     phone = db.Column(db.String(20), nullable=False)
     total_screens = db.Column(db.Integer, nullable=False, default=3)
     created_at = db.Column(db.DateTime, nullable=False, default=db.func.current_timestamp())
@@ -37,31 +155,1768 @@ class Movie(db.Model):
     genre = db.Column(db.String(50), nullable=False)
     rating = db.Column(db.Float, nullable=False)
     poster_url = db.Column(db.String(200), nullable=False)
+    runtime = db.Column(db.Integer, nullable=True)  # minutes; DEFAULT_RUNTIME_MINUTES when unknown
     showtimes = db.relationship('Showtime', backref='movie', lazy=True)
 
 class Showtime(db.Model):
+    # active_history: the rollup listeners need the old movie, theatre, seats and start time
+    # even when the row was expired (e.g. by a commit) before being changed
     id = db.Column(db.Integer, primary_key=True)
-    movie_id = db.Column(db.Integer, db.ForeignKey('movie.id'), nullable=False)
-    theatre_id = db.Column(db.Integer, db.ForeignKey('theatre.id'), nullable=False)
+    movie_id = db.column_property(db.Column(db.Integer, db.ForeignKey('movie.id'), nullable=False, index=True),
+                                  active_history=True)
+    theatre_id = db.column_property(db.Column(db.Integer, db.ForeignKey('theatre.id'), nullable=False, index=True),
+                                    active_history=True)
     show_date = db.Column(db.String(20), nullable=False)
     show_time = db.Column(db.String(10), nullable=False)
     screen = db.Column(db.String(10), nullable=False)
-    total_seats = db.Column(db.Integer, nullable=False, default=40)
-    booked_seats = db.Column(db.String(200), nullable=False, default='')  # comma-separated seat numbers
+    total_seats = db.column_property(db.Column(db.Integer, nullable=False, default=40), active_history=True)
+    seat_map = db.Column(db.LargeBinary, nullable=False, default=b'')  # bitmap of booked seats, see SeatMap
+    # derived from show_date + show_time on save
+    starts_at = db.column_property(db.Column(db.DateTime, nullable=True, index=True), active_history=True)
+    ends_at = db.Column(db.DateTime, nullable=True)  # starts_at + the movie's runtime
     theatre = db.relationship('Theatre', backref='showtimes')
+    __table_args__ = (db.Index('ix_showtime_screen_starts_at', 'theatre_id', 'screen', 'starts_at'),)
+
+    def get_seat_map(self):
+        return SeatMap(self.total_seats, self.seat_map)
+
+    @classmethod
+    def upcoming(cls, now=None):
+        """Query for showtimes that haven't started yet"""
+        return cls.query.filter(cls.starts_at >= (now or datetime.now()))
+
+    @classmethod
+    def past(cls, now=None):
+        """Query for showtimes that have already started"""
+        return cls.query.filter(cls.starts_at < (now or datetime.now()))
+
+    @classmethod
+    def between(cls, start, end):
+        """Query for showtimes starting in [start, end)"""
+        return cls.query.filter(cls.starts_at >= start, cls.starts_at < end)
+
+def parse_show_datetime(show_date, show_time):
+    """Combine the form's 'YYYY-MM-DD' date and 'HH:MM' time; None if they don't parse"""
+    try:
+        return datetime.strptime(f'{show_date} {show_time}', '%Y-%m-%d %H:%M')
+    except (TypeError, ValueError):
+        return None
+
+def parse_runtime(value):
+    """Runtime in minutes from a form field; None if it's blank or not a sensible number"""
+    try:
+        runtime = int(value)
+    except (TypeError, ValueError):
+        return None
+    return runtime if 1 <= runtime <= 600 else None
+
+def showtime_end(starts_at, runtime):
+    """When a show starting at starts_at frees its screen"""
+    if starts_at is None:
+        return None
+    return starts_at + timedelta(minutes=runtime or app.config['DEFAULT_RUNTIME_MINUTES'])
+
+@event.listens_for(Showtime, 'before_insert')
+@event.listens_for(Showtime, 'before_update')
+def _set_showtime_starts_at(mapper, connection, showtime):
+    showtime.starts_at = parse_show_datetime(showtime.show_date, showtime.show_time)
+    runtime = connection.scalar(db.select(Movie.runtime).where(Movie.id == showtime.movie_id))
+    showtime.ends_at = showtime_end(showtime.starts_at, runtime)
+
+@event.listens_for(Movie, 'after_update')
+def _update_showtime_ends(mapper, connection, movie):
+    history = db.inspect(movie).attrs.runtime.history
+    if not history.has_changes():
+        return
+    table = Showtime.__table__
+    rows = connection.execute(db.select(table.c.id, table.c.starts_at).where(table.c.movie_id == movie.id)).fetchall()
+    if rows:
+        connection.execute(table.update().where(table.c.id == db.bindparam('b_id')).values(ends_at=db.bindparam('b_ends_at')),
+                           [{'b_id': showtime_id, 'b_ends_at': showtime_end(starts_at, movie.runtime)} for showtime_id, starts_at in rows])
+
+def find_screen_conflict(theatre_id, screen, starts_at, ends_at, exclude_id=None):
+    """The showtime on this screen that overlaps [starts_at, ends_at), or None.
+
+    Shows on a screen don't overlap each other, so only the last one to start before
+    ends_at can run into the new show. The (theatre_id, screen, starts_at) index finds
+    it with one seek instead of a scan of the theatre's showtimes.
+    """
+    with db.session.no_autoflush:
+        query = Showtime.query.filter(Showtime.theatre_id == theatre_id, Showtime.screen == screen,
+                                      Showtime.starts_at < ends_at)
+        if exclude_id is not None:
+            query = query.filter(Showtime.id != exclude_id)
+        latest = query.order_by(Showtime.starts_at.desc()).first()
+    return latest if latest is not None and latest.ends_at and latest.ends_at > starts_at else None
+
+def total_seats_message(showtime):
+    """Why an edited showtime can't have its total_seats, or None if every booked seat still fits"""
+    if int(showtime.total_seats) < 1:
+        return 'A showtime needs at least one seat.'
+    if showtime.id is None:
+        return None
+    with db.session.no_autoflush:
+        highest = db.session.scalar(db.select(func.max(BookingSeat.seat_number))
+                                    .where(BookingSeat.showtime_id == showtime.id))
+    if highest and int(showtime.total_seats) < highest:
+        return f'Seat {highest} is already booked, so this showtime needs at least {highest} seats.'
+    return None
+
+def screen_conflict_message(showtime):
+    """Why a new or edited showtime can't go on its screen, or None if it fits"""
+    starts_at = parse_show_datetime(showtime.show_date, showtime.show_time)
+    if starts_at is None:
+        return 'Enter the show date as YYYY-MM-DD and the time as HH:MM.'
+    movie = db.session.get(Movie, int(showtime.movie_id))
+    if movie is None:
+        return 'Unknown movie.'
+    ends_at = showtime_end(starts_at, movie.runtime)
+    clash = find_screen_conflict(showtime.theatre_id, showtime.screen, starts_at, ends_at, exclude_id=showtime.id)
+    if clash is None:
+        return None
+    return (f'{showtime.screen} is showing {clash.movie.title} from {clash.starts_at:%H:%M} to '
+            f'{clash.ends_at:%H:%M} on {clash.starts_at:%Y-%m-%d}.')
+
+def runtime_conflict_message(movie):
+    """Why a movie's edited runtime would run one of its shows into the next show on that screen, or None"""
+    with db.session.no_autoflush:
+        showtimes = Showtime.query.filter(Showtime.movie_id == movie.id, Showtime.starts_at.isnot(None)).all()
+        for showtime in showtimes:
+            ends_at = showtime_end(showtime.starts_at, movie.runtime)
+            clash = find_screen_conflict(showtime.theatre_id, showtime.screen, showtime.starts_at, ends_at,
+                                         exclude_id=showtime.id)
+            if clash is not None:
+                return (f'At {ends_at - showtime.starts_at} long, the {showtime.starts_at:%Y-%m-%d %H:%M} show on '
+                        f'{showtime.screen} would run into {clash.movie.title} at {clash.starts_at:%H:%M}.')
+    return None
+
+def free_screen_slots(theatre_id, screen, day, min_minutes=0):
+    """Gaps of at least min_minutes between shows on a screen within the day's opening hours"""
+    opens = datetime.combine(day, datetime.min.time()) + timedelta(hours=app.config['SCREEN_OPEN_HOUR'])
+    closes = datetime.combine(day, datetime.min.time()) + timedelta(hours=app.config['SCREEN_CLOSE_HOUR'])
+    # Shows starting in the window, plus the one before it in case it runs past opening time
+    shows = db.session.query(Showtime.starts_at, Showtime.ends_at).filter(
+        Showtime.theatre_id == theatre_id, Showtime.screen == screen,
+        Showtime.starts_at >= opens, Showtime.starts_at < closes).order_by(Showtime.starts_at).all()
+    before = db.session.query(Showtime.starts_at, Showtime.ends_at).filter(
+        Showtime.theatre_id == theatre_id, Showtime.screen == screen,
+        Showtime.starts_at < opens).order_by(Showtime.starts_at.desc()).first()
+    slots, free_from = [], opens
+    for starts_at, ends_at in ([before] if before else []) + shows:
+        if starts_at > free_from and starts_at - free_from >= timedelta(minutes=min_minutes):
+            slots.append((free_from, starts_at))
+        free_from = max(free_from, ends_at or starts_at)
+    if closes > free_from and closes - free_from >= timedelta(minutes=min_minutes):
+        slots.append((free_from, closes))
+    return slots
+
+class SeatMap:
+    """Fixed-width bitmap of the booked seats of one showtime (bit n-1 is seat n)"""
+
+    def __init__(self, total_seats, data=b''):
+        self.total_seats = total_seats
+        size = (total_seats + 7) // 8
+        # Bits past the last seat are kept, not dropped, so writing the map back never
+        # loses a booking; they are just not counted while the screen is smaller
+        self.bits = bytearray((data or b'').ljust(size, b'\0'))
+
+    def _booked(self):
+        return int.from_bytes(self.bits, 'little') & ((1 << self.total_seats) - 1)
+
+    def __contains__(self, seat):
+        seat = int(seat) - 1
+        return 0 <= seat < self.total_seats and bool(self.bits[seat >> 3] & (1 << (seat & 7)))
+
+    def __iter__(self):
+        return _bit_positions(self._booked())
+
+    def add(self, seat):
+        if not 1 <= int(seat) <= self.total_seats:
+            raise ValueError(f'Seat {seat} is outside 1-{self.total_seats}')
+        seat = int(seat) - 1
+        self.bits[seat >> 3] |= 1 << (seat & 7)
+
+    def discard(self, seat):
+        seat = int(seat) - 1
+        if 0 <= seat < len(self.bits) * 8:
+            self.bits[seat >> 3] &= ~(1 << (seat & 7)) & 0xFF
+
+    def booked_count(self):
+        return self._booked().bit_count()
+
+    def available_count(self):
+        return self.total_seats - self.booked_count()
+
+    def to_bytes(self):
+        return bytes(self.bits)
+
+    def diff(self, previous):
+        """Return (booked, released) seat lists going from previous to this map"""
+        new, old = self._booked(), previous._booked()
+        return list(_bit_positions(new & ~old)), list(_bit_positions(old & ~new))
+
+    def to_dict(self):
+        return {'total_seats': self.total_seats, 'booked': list(self), 'available': self.available_count()}
+
+def _bit_positions(value):
+    """Yield the 1-based positions of the set bits of an int, lowest first"""
+    while value:
+        low_bit = value & -value
+        yield low_bit.bit_length()
+        value ^= low_bit
 
 class Booking(db.Model):
+    # (user_id, booking_time) serves my_bookings and also covers lookups by user_id alone
+    __table_args__ = (db.Index('ix_booking_user_id_booking_time', 'user_id', 'booking_time'),)
+    # Read booking_time back on insert, the per-user month list needs it
+    __mapper_args__ = {'eager_defaults': True}
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    showtime_id = db.Column(db.Integer, db.ForeignKey('showtime.id'), nullable=False)
+    showtime_id = db.Column(db.Integer, db.ForeignKey('showtime.id'), nullable=False, index=True)
     seats = db.Column(db.String(100), nullable=False)  # comma-separated seat numbers
-    booking_time = db.Column(db.DateTime, nullable=False, default=db.func.current_timestamp())
+    seat_count = db.Column(db.Integer, nullable=False, default=0)
+    booking_time = db.Column(db.DateTime, nullable=False, default=db.func.current_timestamp(), index=True)
     showtime = db.relationship('Showtime', backref='bookings')
     user = db.relationship('User', backref='bookings')
 
+class BookingSeat(db.Model):
+    # One row per booked seat. The unique constraint is what prevents double-booking:
+    # two buyers racing for the same seat can't both insert it, so the database decides.
+    __table_args__ = (db.UniqueConstraint('showtime_id', 'seat_number', name='uq_booking_seat'),)
+    id = db.Column(db.Integer, primary_key=True)
+    booking_id = db.Column(db.Integer, db.ForeignKey('booking.id'), nullable=False, index=True)
+    showtime_id = db.Column(db.Integer, db.ForeignKey('showtime.id'), nullable=False)
+    seat_number = db.Column(db.Integer, nullable=False)
+    booking = db.relationship('Booking', backref=db.backref('seat_rows', cascade='all, delete-orphan'))
+
+class BookingArchive(db.Model):
+    # Bookings for long-past shows, moved out of the booking table by `flask archive-bookings`.
+    # booking.id is reused by SQLite once the highest id has been archived, so the archive
+    # keeps the old id in booking_id rather than using it as the primary key.
+    id = db.Column(db.Integer, primary_key=True)
+    booking_id = db.Column(db.Integer, nullable=False, index=True)  # id the booking had
+    user_id = db.Column(db.Integer, nullable=False, index=True)
+    showtime_id = db.Column(db.Integer, nullable=False)
+    seats = db.Column(db.String(100), nullable=False)
+    seat_count = db.Column(db.Integer, nullable=False, default=0)
+    booking_time = db.Column(db.DateTime, nullable=False)
+    archived_at = db.Column(db.DateTime, nullable=False, default=db.func.current_timestamp())
+
+class UserBookingSummary(db.Model):
+    # Running totals over a user's rows in the booking table, kept up to date in the same
+    # transaction as every booking insert/delete so the profile page reads one row.
+    # Archived bookings drop out, just as they drop out of my_bookings.
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    bookings = db.Column(db.Integer, nullable=False, default=0)
+    seats = db.Column(db.Integer, nullable=False, default=0)
+    spend = db.Column(db.Integer, nullable=False, default=0)  # Rs.
+    last_booking_at = db.Column(db.DateTime, nullable=True)
+
+class UserBookingMonth(db.Model):
+    # The months a user has bookings in (first day of the month), for the my_bookings filter.
+    # Maintained alongside UserBookingSummary; a month's row goes when its last booking does.
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    month = db.Column(db.Date, primary_key=True)
+    bookings = db.Column(db.Integer, nullable=False, default=0)
+
+# Occupancy and revenue rollups, kept up to date by apply_rollups as showtimes and bookings
+# change. Archived bookings stay counted: the rollups are the long-term record of sales.
+class ShowtimeRollup(db.Model):
+    showtime_id = db.Column(db.Integer, db.ForeignKey('showtime.id'), primary_key=True)
+    bookings = db.Column(db.Integer, nullable=False, default=0)
+    seats_sold = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Integer, nullable=False, default=0)  # Rs.
+
+class MovieDailyRollup(db.Model):
+    movie_id = db.Column(db.Integer, db.ForeignKey('movie.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)  # date of the shows, not of the bookings
+    showtimes = db.Column(db.Integer, nullable=False, default=0)
+    capacity = db.Column(db.Integer, nullable=False, default=0)
+    bookings = db.Column(db.Integer, nullable=False, default=0)
+    seats_sold = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Integer, nullable=False, default=0)
+
+class TheatreDailyRollup(db.Model):
+    theatre_id = db.Column(db.Integer, db.ForeignKey('theatre.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    showtimes = db.Column(db.Integer, nullable=False, default=0)
+    capacity = db.Column(db.Integer, nullable=False, default=0)
+    bookings = db.Column(db.Integer, nullable=False, default=0)
+    seats_sold = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Integer, nullable=False, default=0)
+
+class SeatHold(db.Model):
+    # A seat set aside for one user while they check out. Lives in the database so every
+    # worker process sees it; the unique constraint means only one user can hold a seat.
+    # Expired rows are ignored by every query and deleted lazily (see hold_seats) or by
+    # `flask sweep-seat-holds`.
+    __table_args__ = (db.UniqueConstraint('showtime_id', 'seat_number', name='uq_seat_hold'),)
+    id = db.Column(db.Integer, primary_key=True)
+    showtime_id = db.Column(db.Integer, db.ForeignKey('showtime.id'), nullable=False)
+    seat_number = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+class CatalogueVersion(db.Model):
+    # Change counters behind the ETag/Last-Modified headers of the catalogue pages:
+    # 'catalogue' for the movie list, 'movie:<id>' for a movie's showtimes and seats.
+    # Bumped by invalidate_catalogue; in the database so every worker agrees.
+    key = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False)  # UTC, for Last-Modified
+
+class SeatConflictError(Exception):
+    """Raised when one or more requested seats were already booked or held by someone else"""
+
+def update_seat_map(showtime_id, seat_numbers, booked=True):
+    """Set or clear seats in a showtime's bitmap.
+
+    The seat rows are what actually guard against double-booking; this just keeps the
+    bitmap in step. The UPDATE only applies if the map is unchanged since we read it,
+    so two writers can never drop each other's seats.
+    """
+    while True:
+        current, total_seats = db.session.query(Showtime.seat_map, Showtime.total_seats).filter_by(id=showtime_id).one()
+        seat_map = SeatMap(total_seats, current)
+        for seat in seat_numbers:
+            if booked:
+                seat_map.add(seat)
+            else:
+                seat_map.discard(seat)
+        result = db.session.execute(db.update(Showtime)
+                                    .where(Showtime.id == showtime_id, Showtime.seat_map == current)
+                                    .values(seat_map=seat_map.to_bytes())
+                                    .execution_options(synchronize_session=False))
+        if result.rowcount:
+            return seat_map
+
+def reserve_seats(showtime, user_id, seat_numbers):
+    """Atomically book seats for a user.
+
+    All seat rows are inserted in a single statement inside one transaction, so if any
+    seat is already taken the unique constraint fails and nothing is written. Seats held
+    by another user can't be booked; the user's own holds on the showtime are released.
+    The movie's catalogue version is bumped in the same transaction, so a booking costs
+    one commit and is never reported as failed after it went through.
+    """
+    seats = sorted(set(seat_numbers))
+    booking = Booking(user_id=user_id, showtime_id=showtime.id, seats=','.join(str(s) for s in seats),
+                      seat_count=len(seats))
+    db.session.add(booking)
+    try:
+        db.session.flush()
+        # Checked after the first write, so the transaction already has the write lock
+        # and no hold can be placed between this check and the commit
+        now = datetime.now()
+        holds = active_seat_holds(showtime.id, now)
+        if any(holds.get(seat, user_id) != user_id for seat in seats):
+            db.session.rollback()
+            raise SeatConflictError('Some selected seats are being held by another customer.')
+        hold = SeatHold.__table__
+        db.session.execute(hold.delete().where(hold.c.showtime_id == showtime.id,
+                                               db.or_(hold.c.user_id == user_id, hold.c.expires_at <= now)))
+        db.session.execute(BookingSeat.__table__.insert(),
+                           [{'booking_id': booking.id, 'showtime_id': showtime.id, 'seat_number': s} for s in seats])
+        update_seat_map(showtime.id, seats)
+        add_to_booking_summary(user_id, len(seats), booking.booking_time)
+        apply_rollups(db.session, [(showtime.id, showtime.movie_id, showtime.theatre_id, showtime.starts_at,
+                                    {'bookings': 1, 'seats_sold': len(seats), 'revenue': len(seats) * TICKET_PRICE})])
+        bump_catalogue_version(f'movie:{showtime.movie_id}')
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        raise SeatConflictError('Some selected seats are already booked.')
+    return booking
+
+def active_seat_holds(showtime_id, now=None):
+    """{seat_number: user_id} for the unexpired holds on a showtime"""
+    hold = SeatHold.__table__
+    return dict(db.session.execute(db.select(hold.c.seat_number, hold.c.user_id).where(
+        hold.c.showtime_id == showtime_id, hold.c.expires_at > (now or datetime.now()))).all())
+
+def hold_seats(showtime, user_id, seat_numbers):
+    """Make seat_numbers the user's held seats for a showtime, as far as they are free.
+
+    Renews the expiry of seats the user already holds and releases the ones no longer
+    selected (an empty selection releases them all). Returns (held, taken, expires_at),
+    taken being the requested seats that are booked or held by someone else.
+    Raises SeatConflictError if another user grabbed a seat at the same moment.
+    """
+    now = datetime.now()
+    expires_at = now + timedelta(seconds=app.config['SEAT_HOLD_TTL'])
+    seats = sorted(set(seat_numbers))
+    hold = SeatHold.__table__
+    # Reclaim this showtime's expired holds along the way
+    db.session.execute(hold.delete().where(hold.c.showtime_id == showtime.id, db.or_(
+        hold.c.expires_at <= now, db.and_(hold.c.user_id == user_id, hold.c.seat_number.not_in(seats)))))
+    holds = active_seat_holds(showtime.id, now)
+    # The delete above took the write lock, so re-read the seat map now rather than trust
+    # showtime's copy, which was loaded before it and can miss a booking committed since
+    seat_map = SeatMap(*db.session.execute(db.select(Showtime.total_seats, Showtime.seat_map)
+                                           .where(Showtime.id == showtime.id)).one())
+    taken = [seat for seat in seats if seat in seat_map or holds.get(seat, user_id) != user_id]
+    held = [seat for seat in seats if seat not in taken]
+    db.session.execute(hold.update().where(hold.c.showtime_id == showtime.id, hold.c.user_id == user_id)
+                       .values(expires_at=expires_at))
+    new = [seat for seat in held if seat not in holds]
+    if new:
+        db.session.execute(hold.insert(), [{'showtime_id': showtime.id, 'seat_number': seat, 'user_id': user_id,
+                                            'expires_at': expires_at} for seat in new])
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        raise SeatConflictError('Some selected seats were just taken.')
+    return held, taken, expires_at
+
+def release_expired_seat_holds():
+    """Delete every expired hold; returns how many there were"""
+    result = db.session.execute(SeatHold.__table__.delete().where(SeatHold.__table__.c.expires_at <= datetime.now()))
+    db.session.commit()
+    return result.rowcount
+
+@app.cli.command('sweep-seat-holds')
+def sweep_seat_holds_command():
+    """Delete expired seat holds (safe to run from cron)"""
+    print(f"✓ Released {release_expired_seat_holds()} expired seat hold(s)")
+
+def cancel_booking(booking):
+    """Delete a booking, release its seats and retire its movie's cached pages (caller commits)"""
+    showtime = booking.showtime
+    update_seat_map(booking.showtime_id, [row.seat_number for row in booking.seat_rows], booked=False)
+    db.session.delete(booking)
+    db.session.flush()
+    subtract_from_booking_summaries([(booking.user_id, month_start(booking.booking_time), 1, booking.seat_count)])
+    apply_rollups(db.session, [(showtime.id, showtime.movie_id, showtime.theatre_id, showtime.starts_at,
+                                {'bookings': -1, 'seats_sold': -booking.seat_count,
+                                 'revenue': -booking.seat_count * TICKET_PRICE})])
+    bump_catalogue_version(f'movie:{showtime.movie_id}')
+
+def delete_bookings(booking_ids, release_seats=True):
+    """Delete many bookings with set-based DELETEs (caller commits).
+
+    Seats are released in each showtime's seat map with one update per showtime and the
+    bookings are taken out of the rollups. With release_seats=False (archiving) both are
+    left alone as the record of a show that happened.
+    Returns the number of bookings deleted.
+    """
+    if not booking_ids:
+        return 0
+    if release_seats:
+        apply_rollups(db.session, [
+            (showtime_id, movie_id, theatre_id, starts_at,
+             {'bookings': -count, 'seats_sold': -seats, 'revenue': -seats * TICKET_PRICE})
+            for showtime_id, movie_id, theatre_id, starts_at, count, seats in db.session.execute(
+                db.select(Showtime.id, Showtime.movie_id, Showtime.theatre_id, Showtime.starts_at,
+                          func.count(Booking.id), func.coalesce(func.sum(Booking.seat_count), 0))
+                .join(Booking, Booking.showtime_id == Showtime.id).where(Booking.id.in_(booking_ids))
+                .group_by(Showtime.id))])
+        seats_by_showtime = {}
+        for showtime_id, seat in db.session.query(BookingSeat.showtime_id, BookingSeat.seat_number) \
+                .filter(BookingSeat.booking_id.in_(booking_ids)):
+            seats_by_showtime.setdefault(showtime_id, []).append(seat)
+        for showtime_id, seats in seats_by_showtime.items():
+            update_seat_map(showtime_id, seats, booked=False)
+    totals = booking_totals_by_user(Booking.id.in_(booking_ids))
+    db.session.execute(db.delete(BookingSeat).where(BookingSeat.booking_id.in_(booking_ids)),
+                       execution_options={'synchronize_session': False})
+    result = db.session.execute(db.delete(Booking).where(Booking.id.in_(booking_ids)),
+                                execution_options={'synchronize_session': False})
+    subtract_from_booking_summaries(totals)
+    return result.rowcount
+
+def delete_showtimes(*criteria):
+    """Delete the showtimes matching criteria with all their bookings, seats and holds (caller commits).
+
+    A fixed set of DELETE ... WHERE showtime_id IN (SELECT ...) statements, however many rows are involved.
+    """
+    showtime_ids = db.select(Showtime.id).where(*criteria)
+    rollup = ShowtimeRollup.__table__
+    apply_rollups(db.session, [
+        (None, movie_id, theatre_id, starts_at,
+         {'showtimes': -1, 'capacity': -total_seats, 'bookings': -(bookings or 0),
+          'seats_sold': -(seats_sold or 0), 'revenue': -(revenue or 0)})
+        for movie_id, theatre_id, starts_at, total_seats, bookings, seats_sold, revenue in db.session.execute(
+            db.select(Showtime.movie_id, Showtime.theatre_id, Showtime.starts_at, Showtime.total_seats,
+                      rollup.c.bookings, rollup.c.seats_sold, rollup.c.revenue)
+            .outerjoin(rollup, rollup.c.showtime_id == Showtime.id).where(*criteria))])
+    db.session.execute(rollup.delete().where(rollup.c.showtime_id.in_(showtime_ids)))
+    totals = booking_totals_by_user(Booking.showtime_id.in_(showtime_ids))
+    db.session.execute(db.delete(BookingSeat).where(BookingSeat.showtime_id.in_(showtime_ids)),
+                       execution_options={'synchronize_session': False})
+    db.session.execute(db.delete(Booking).where(Booking.showtime_id.in_(showtime_ids)),
+                       execution_options={'synchronize_session': False})
+    subtract_from_booking_summaries(totals)
+    db.session.execute(db.delete(SeatHold).where(SeatHold.showtime_id.in_(showtime_ids)),
+                       execution_options={'synchronize_session': False})
+    result = db.session.execute(db.delete(Showtime).where(*criteria),
+                                execution_options={'synchronize_session': False})
+    return result.rowcount
+
+def archive_bookings(older_than_days, batch_size=500, pause=0.0):
+    """Move bookings for shows that started more than older_than_days ago into booking_archive.
+
+    Works in batches of batch_size, each in its own short transaction, so the database
+    is never locked for long. Seat maps are left alone as a record of past occupancy.
+    Returns the number of bookings archived.
+    """
+    cutoff = datetime.now() - timedelta(days=older_than_days)
+    booking_table = Booking.__table__
+    archived = 0
+    while True:
+        booking_ids = db.session.scalars(db.select(Booking.id).join(Showtime).where(Showtime.starts_at < cutoff)
+                                         .order_by(Booking.id).limit(batch_size)).all()
+        if not booking_ids:
+            return archived
+        columns = ['user_id', 'showtime_id', 'seats', 'seat_count', 'booking_time']
+        db.session.execute(BookingArchive.__table__.insert().from_select(
+            ['booking_id', *columns], db.select(booking_table.c.id, *[booking_table.c[name] for name in columns])
+            .where(booking_table.c.id.in_(booking_ids))))
+        archived += delete_bookings(booking_ids, release_seats=False)
+        db.session.commit()
+        if pause:
+            time.sleep(pause)
+
+@app.cli.command('archive-bookings')
+@click.option('--days', default=90, show_default=True, help='Archive bookings for shows older than this many days.')
+@click.option('--batch-size', default=None, type=int, help='Bookings per transaction.')
+@click.option('--pause', default=0.0, show_default=True, help='Seconds to sleep between batches.')
+def archive_bookings_command(days, batch_size, pause):
+    """Archive bookings for past shows (safe to run from cron)"""
+    archived = archive_bookings(days, batch_size or app.config['ARCHIVE_BATCH_SIZE'], pause)
+    print(f"✓ Archived {archived} booking(s) older than {days} days")
+
+def _last_booking_time(summary):
+    # Newest booking_time for the summary row's user: one step down the (user_id, booking_time) index
+    return db.select(func.max(Booking.booking_time)).where(Booking.user_id == summary.c.user_id).scalar_subquery()
+
+def month_start(moment):
+    return moment.date().replace(day=1)
+
+def next_month(month):
+    return month.replace(year=month.year + 1, month=1) if month.month == 12 else month.replace(month=month.month + 1)
+
+def _booking_month(booking_time):
+    # SQL twin of month_start, for grouping in the database
+    return func.date(booking_time, 'start of month', type_=db.Date)
+
+def add_to_booking_summary(user_id, seat_count, booking_time):
+    """Count a new booking in the user's summary and month list (call after the booking row is flushed)"""
+    summary = UserBookingSummary.__table__
+    result = db.session.execute(summary.update().where(summary.c.user_id == user_id).values(
+        bookings=summary.c.bookings + 1, seats=summary.c.seats + seat_count,
+        spend=summary.c.spend + seat_count * TICKET_PRICE, last_booking_at=_last_booking_time(summary)))
+    if result.rowcount == 0:
+        # First booking since the summaries were built: total up the user's history once.
+        # If a concurrent booking creates the row first, fall back to updating it.
+        try:
+            with db.session.begin_nested():
+                rebuild_booking_summaries([user_id])
+        except IntegrityError:
+            add_to_booking_summary(user_id, seat_count, booking_time)
+        return
+    _add_to_booking_month(user_id, month_start(booking_time))
+
+def _add_to_booking_month(user_id, month):
+    months = UserBookingMonth.__table__
+    result = db.session.execute(months.update().where(months.c.user_id == user_id, months.c.month == month)
+                                .values(bookings=months.c.bookings + 1))
+    if result.rowcount == 0:
+        try:
+            with db.session.begin_nested():
+                db.session.execute(months.insert().values(user_id=user_id, month=month, bookings=1))
+        except IntegrityError:
+            _add_to_booking_month(user_id, month)
+
+def booking_totals_by_user(*criteria):
+    """(user_id, month, bookings, seats) for the bookings matching criteria, to subtract once they are deleted"""
+    month = _booking_month(Booking.booking_time)
+    return db.session.execute(db.select(Booking.user_id, month, func.count(Booking.id),
+                                        func.coalesce(func.sum(Booking.seat_count), 0))
+                              .where(*criteria).group_by(Booking.user_id, month)).all()
+
+def subtract_from_booking_summaries(totals):
+    """Take deleted bookings out of their users' summaries and month lists (call after the DELETE)"""
+    if not totals:
+        return
+    per_user = {}
+    for user_id, _, count, seat_count in totals:
+        user_count, user_seats = per_user.get(user_id, (0, 0))
+        per_user[user_id] = (user_count + count, user_seats + seat_count)
+    summary = UserBookingSummary.__table__
+    seats = db.bindparam('b_seats', type_=db.Integer)
+    db.session.execute(summary.update().where(summary.c.user_id == db.bindparam('b_user_id')).values(
+        bookings=summary.c.bookings - db.bindparam('b_bookings'), seats=summary.c.seats - seats,
+        spend=summary.c.spend - seats * TICKET_PRICE, last_booking_at=_last_booking_time(summary)),
+        [{'b_user_id': user_id, 'b_bookings': count, 'b_seats': seat_count}
+         for user_id, (count, seat_count) in per_user.items()])
+    months = UserBookingMonth.__table__
+    db.session.execute(months.update().where(months.c.user_id == db.bindparam('b_user_id'),
+                                             months.c.month == db.bindparam('b_month', type_=db.Date))
+                       .values(bookings=months.c.bookings - db.bindparam('b_bookings')),
+                       [{'b_user_id': user_id, 'b_month': month, 'b_bookings': count} for user_id, month, count, _ in totals])
+    db.session.execute(months.delete().where(months.c.user_id.in_(per_user), months.c.bookings <= 0))
+
+def _summary_totals():
+    booking = Booking.__table__
+    seats = func.coalesce(func.sum(booking.c.seat_count), 0)
+    return db.select(booking.c.user_id, func.count(booking.c.id).label('bookings'), seats.label('seats'),
+                     (seats * TICKET_PRICE).label('spend'), func.max(booking.c.booking_time).label('last_booking_at')) \
+        .group_by(booking.c.user_id)
+
+def _month_totals():
+    booking = Booking.__table__
+    month = _booking_month(booking.c.booking_time)
+    return db.select(booking.c.user_id, month.label('month'), func.count(booking.c.id).label('bookings')) \
+        .group_by(booking.c.user_id, month)
+
+def rebuild_booking_summaries(user_ids=None, connection=None):
+    """Recompute booking summaries and month lists from the booking table, for every user or just user_ids"""
+    executor = connection if connection is not None else db.session
+    for model, totals, columns in ((UserBookingSummary, _summary_totals(), ['user_id', 'bookings', 'seats', 'spend', 'last_booking_at']),
+                                   (UserBookingMonth, _month_totals(), ['user_id', 'month', 'bookings'])):
+        table = model.__table__
+        delete = table.delete()
+        if user_ids is not None:
+            totals = totals.where(Booking.__table__.c.user_id.in_(user_ids))
+            delete = delete.where(table.c.user_id.in_(user_ids))
+        executor.execute(delete)
+        executor.execute(table.insert().from_select(columns, totals))
+
+def find_stale_booking_summaries():
+    """Ids of users whose summary doesn't match their bookings"""
+    summary = UserBookingSummary.__table__
+    expected = _summary_totals().subquery()
+    # Users with bookings whose row is missing or has drifted
+    drifted = db.select(expected.c.user_id).outerjoin(summary, summary.c.user_id == expected.c.user_id).where(db.or_(
+        summary.c.user_id.is_(None), summary.c.bookings != expected.c.bookings, summary.c.seats != expected.c.seats,
+        summary.c.spend != expected.c.spend, summary.c.last_booking_at != expected.c.last_booking_at))
+    # Rows that still count something for users with no bookings left
+    leftover = db.select(summary.c.user_id).where(
+        ~db.exists().where(Booking.__table__.c.user_id == summary.c.user_id),
+        db.or_(summary.c.bookings != 0, summary.c.seats != 0, summary.c.spend != 0, summary.c.last_booking_at.is_not(None)))
+    # Month lists with a month missing, miscounted or left over
+    months = UserBookingMonth.__table__
+    expected_months = _month_totals().subquery()
+    missing_months = db.select(expected_months.c.user_id).outerjoin(months, db.and_(
+        months.c.user_id == expected_months.c.user_id, months.c.month == expected_months.c.month)).where(
+        db.or_(months.c.user_id.is_(None), months.c.bookings != expected_months.c.bookings))
+    extra_months = db.select(months.c.user_id).outerjoin(expected_months, db.and_(
+        expected_months.c.user_id == months.c.user_id, expected_months.c.month == months.c.month)).where(
+        expected_months.c.user_id.is_(None))
+    return sorted(db.session.scalars(db.union(drifted, leftover, missing_months, extra_months)).all())
+
+@app.cli.command('rebuild-booking-summaries')
+def rebuild_booking_summaries_command():
+    """Recompute every user's booking summary (backfill or repair)"""
+    rebuild_booking_summaries()
+    db.session.commit()
+    print(f"✓ Rebuilt booking summaries for {db.session.query(func.count(UserBookingSummary.user_id)).scalar()} user(s)")
+
+@app.cli.command('check-booking-summaries')
+@click.option('--fix', is_flag=True, help='Rebuild the summaries that are out of date.')
+def check_booking_summaries_command(fix):
+    """Compare booking summaries with the booking table"""
+    stale = find_stale_booking_summaries()
+    if not stale:
+        print("✓ Booking summaries are consistent")
+        return
+    print(f"✗ {len(stale)} booking summar{'y is' if len(stale) == 1 else 'ies are'} out of date "
+          f"(user ids: {', '.join(str(user_id) for user_id in stale[:20])}{', ...' if len(stale) > 20 else ''})")
+    if not fix:
+        raise SystemExit(1)
+    rebuild_booking_summaries(stale)
+    db.session.commit()
+    print(f"✓ Rebuilt {len(stale)} booking summar{'y' if len(stale) == 1 else 'ies'}")
+
+ROLLUP_COLUMNS = ('showtimes', 'capacity', 'bookings', 'seats_sold', 'revenue')
+
+def apply_rollups(executor, changes):
+    """Add per-showtime changes to the showtime, movie-day and theatre-day rollups.
+
+    changes is a list of (showtime_id, movie_id, theatre_id, starts_at, deltas), deltas mapping
+    ROLLUP_COLUMNS to the amount to add (negative to subtract). showtime_id None skips the
+    per-showtime row. Runs on executor (a session or connection) in the caller's transaction.
+    A movie-day or theatre-day row is dropped once it has no showtimes left, as
+    rebuild_rollups would leave it out. Showtimes without a starts_at are only counted
+    per showtime (see sales_totals). Archived bookings stay counted everywhere.
+    """
+    showtime_rollup = ShowtimeRollup.__table__
+    daily = {}
+    for showtime_id, movie_id, theatre_id, starts_at, deltas in changes:
+        showtime_deltas = {name: value for name, value in deltas.items() if name in showtime_rollup.c}
+        if showtime_id is not None and showtime_deltas:
+            executor.execute(showtime_rollup.update().where(showtime_rollup.c.showtime_id == showtime_id)
+                             .values({name: showtime_rollup.c[name] + value for name, value in showtime_deltas.items()}))
+        if starts_at is None:
+            continue  # no date to file it under
+        for model, key in ((MovieDailyRollup, movie_id), (TheatreDailyRollup, theatre_id)):
+            if key is not None:
+                totals = daily.setdefault((model, key, starts_at.date()), dict.fromkeys(ROLLUP_COLUMNS, 0))
+                for name, value in deltas.items():
+                    totals[name] += value
+    for (model, key, day), deltas in daily.items():
+        table = model.__table__
+        key_column = table.c.movie_id if model is MovieDailyRollup else table.c.theatre_id
+        result = executor.execute(table.update().where(key_column == key, table.c.day == day)
+                                  .values({name: table.c[name] + value for name, value in deltas.items()}))
+        if result.rowcount == 0:
+            executor.execute(table.insert().values({key_column.name: key, 'day': day, **deltas}))
+        elif deltas.get('showtimes', 0) < 0:
+            executor.execute(table.delete().where(key_column == key, table.c.day == day, table.c.showtimes <= 0))
+
+def _history(showtime, name):
+    """(old, new) value of a showtime attribute in the flush being processed"""
+    history = db.inspect(showtime).attrs[name].history
+    new = getattr(showtime, name)
+    return (history.deleted[0] if history.deleted else new), new
+
+@event.listens_for(Showtime, 'after_insert')
+def _add_showtime_to_rollups(mapper, connection, showtime):
+    connection.execute(ShowtimeRollup.__table__.insert().values(showtime_id=showtime.id))
+    apply_rollups(connection, [(None, showtime.movie_id, showtime.theatre_id, showtime.starts_at,
+                                {'showtimes': 1, 'capacity': int(showtime.total_seats)})])
+
+@event.listens_for(Showtime, 'after_update')
+def _move_showtime_in_rollups(mapper, connection, showtime):
+    old_movie, new_movie = _history(showtime, 'movie_id')
+    old_theatre, new_theatre = _history(showtime, 'theatre_id')
+    old_start, new_start = _history(showtime, 'starts_at')
+    old_seats, new_seats = (int(seats) for seats in _history(showtime, 'total_seats'))
+    old_day, new_day = (start.date() if start else None for start in (old_start, new_start))
+    if (old_movie, old_theatre, old_day, old_seats) == (new_movie, new_theatre, new_day, new_seats):
+        return
+    # Take the showtime out of the old movie/theatre/day rows and put it in the new ones
+    rollup = ShowtimeRollup.__table__
+    sold = connection.execute(db.select(rollup.c.bookings, rollup.c.seats_sold, rollup.c.revenue)
+                              .where(rollup.c.showtime_id == showtime.id)).first() or (0, 0, 0)
+    moved = dict(zip(('bookings', 'seats_sold', 'revenue'), sold), showtimes=1)
+    apply_rollups(connection, [
+        (None, old_movie, old_theatre, old_start, {name: -value for name, value in dict(moved, capacity=old_seats).items()}),
+        (None, new_movie, new_theatre, new_start, dict(moved, capacity=new_seats)),
+    ])
+
+def rebuild_rollups(connection=None):
+    """Recompute all rollups from the showtime, booking and booking_archive tables"""
+    executor = connection if connection is not None else db.session
+    showtime, rollup = Showtime.__table__, ShowtimeRollup.__table__
+    sales = db.union_all(
+        db.select(Booking.__table__.c.showtime_id, Booking.__table__.c.seat_count),
+        db.select(BookingArchive.__table__.c.showtime_id, BookingArchive.__table__.c.seat_count)).subquery()
+    per_showtime = db.select(sales.c.showtime_id, func.count().label('bookings'),
+                             func.sum(sales.c.seat_count).label('seats_sold')).group_by(sales.c.showtime_id).subquery()
+    for model in (ShowtimeRollup, MovieDailyRollup, TheatreDailyRollup):
+        executor.execute(model.__table__.delete())
+    seats_sold = func.coalesce(per_showtime.c.seats_sold, 0)
+    executor.execute(rollup.insert().from_select(
+        ['showtime_id', 'bookings', 'seats_sold', 'revenue'],
+        db.select(showtime.c.id, func.coalesce(per_showtime.c.bookings, 0), seats_sold, seats_sold * TICKET_PRICE)
+        .outerjoin(per_showtime, per_showtime.c.showtime_id == showtime.c.id)))
+    for model, key_column in ((MovieDailyRollup, showtime.c.movie_id), (TheatreDailyRollup, showtime.c.theatre_id)):
+        day = func.date(showtime.c.starts_at)
+        executor.execute(model.__table__.insert().from_select(
+            [key_column.name, 'day', *ROLLUP_COLUMNS],
+            db.select(key_column, day, func.count(), func.sum(showtime.c.total_seats), func.sum(rollup.c.bookings),
+                      func.sum(rollup.c.seats_sold), func.sum(rollup.c.revenue))
+            .join(rollup, rollup.c.showtime_id == showtime.c.id).where(showtime.c.starts_at.is_not(None))
+            .group_by(key_column, day)))
+
+def sales_totals(*criteria):
+    """(bookings, seats_sold, revenue) over the showtimes matching criteria, archived bookings included.
+
+    Summed from the per-showtime rollups, which cover every showtime; the daily rollups
+    leave out showtimes whose date couldn't be parsed (starts_at NULL).
+    """
+    rollup = ShowtimeRollup.__table__
+    return db.session.execute(db.select(func.coalesce(func.sum(rollup.c.bookings), 0),
+                                        func.coalesce(func.sum(rollup.c.seats_sold), 0),
+                                        func.coalesce(func.sum(rollup.c.revenue), 0))
+                              .join(Showtime, Showtime.id == rollup.c.showtime_id).where(*criteria)).one()
+
+def rollup_series(model, start, end, **keys):
+    """Per-day occupancy and revenue for days in [start, end), from a daily rollup table.
+
+    keys filter the rows (e.g. theatre_id=3); without keys all rows are summed per day.
+    Reads at most one row per key per day, however many bookings are behind them.
+    """
+    table = model.__table__
+    rows = db.session.execute(
+        db.select(table.c.day, *[func.sum(table.c[name]).label(name) for name in ROLLUP_COLUMNS])
+        .where(table.c.day >= start, table.c.day < end, *[table.c[name] == value for name, value in keys.items()])
+        .group_by(table.c.day).order_by(table.c.day)).all()
+    days = [dict(day=row.day.isoformat(), **{name: row._mapping[name] for name in ROLLUP_COLUMNS}) for row in rows]
+    totals = {name: sum(day[name] for day in days) for name in ROLLUP_COLUMNS}
+    for entry in days + [totals]:
+        entry['occupancy_pct'] = round(100 * entry['seats_sold'] / entry['capacity'], 1) if entry['capacity'] else 0.0
+    return {'start': start.isoformat(), 'end': end.isoformat(), 'days': days, 'totals': totals}
+
+def _rollup_range():
+    """[start, end) dates from ?start=&end= (YYYY-MM-DD), defaulting to the last 30 days"""
+    try:
+        end = datetime.strptime(request.args['end'], '%Y-%m-%d').date() if request.args.get('end') \
+            else datetime.now().date() + timedelta(days=1)
+        start = datetime.strptime(request.args['start'], '%Y-%m-%d').date() if request.args.get('start') \
+            else end - timedelta(days=30)
+    except ValueError:
+        abort(400)
+    return start, end
+
+# Bulk scheduling
+def expand_recurrence(movie_id, screens, times, start_date, end_date, weekdays=None, total_seats=40):
+    """Showtime rows for every screen x time on each day in [start_date, end_date] (weekdays: 0 = Monday)"""
+    rows = []
+    day = start_date
+    while day <= end_date:
+        if not weekdays or day.weekday() in weekdays:
+            rows.extend({'movie_id': movie_id, 'show_date': day.isoformat(), 'show_time': show_time,
+                         'screen': screen, 'total_seats': total_seats} for screen in screens for show_time in times)
+        day += timedelta(days=1)
+    return rows
+
+def parse_schedule_request():
+    """Showtime rows from a bulk scheduling request.
+
+    Accepts a CSV or JSON upload ('file'), a JSON body with a 'showtimes' list, or a
+    recurrence (movie_id, screens, times, start_date, end_date, optional weekdays and
+    total_seats) as form fields or JSON. Raises ValueError if the request can't be read.
+    """
+    data = request.get_json(silent=True) if request.is_json else request.form
+    if not isinstance(data, dict):
+        raise ValueError('Send a JSON object with a "showtimes" list or the recurrence fields.')
+    upload = request.files.get('file')
+    if upload and upload.filename:
+        text = upload.read().decode('utf-8-sig')
+        if upload.filename.lower().endswith('.json'):
+            uploaded = json.loads(text)
+            rows = uploaded.get('showtimes', []) if isinstance(uploaded, dict) else uploaded
+        else:
+            rows = list(csv.DictReader(io.StringIO(text)))
+    elif request.is_json and 'showtimes' in data:
+        rows = data['showtimes']
+    else:
+        def values(key):
+            # A JSON list, repeated form fields, or one comma-separated value
+            items = data.get(key) if request.is_json else data.getlist(key)
+            if not isinstance(items, list):
+                items = [items]
+            if len(items) == 1 and isinstance(items[0], str):
+                items = items[0].split(',')
+            return [str(item).strip() for item in items if item is not None and str(item).strip()]
+
+        try:
+            movie_id = int(data.get('movie_id'))
+            start_date = datetime.strptime(str(data.get('start_date')), '%Y-%m-%d').date()
+            end_date = datetime.strptime(str(data.get('end_date') or data.get('start_date')), '%Y-%m-%d').date()
+            weekdays = {int(day) for day in values('weekdays')}
+            total_seats = int(data.get('total_seats') or 40)
+        except (TypeError, ValueError):
+            raise ValueError('A recurrence needs a movie, a start date and an end date (YYYY-MM-DD).')
+        screens, times = values('screens'), values('times')
+        if not screens or not times:
+            raise ValueError('Pick at least one screen and one show time.')
+        if not start_date <= end_date <= start_date + timedelta(days=366):
+            raise ValueError('The end date must be on or after the start date, and within a year of it.')
+        rows = expand_recurrence(movie_id, screens, times, start_date, end_date, weekdays, total_seats)
+    if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+        raise ValueError('Showtimes must be a list of rows.')
+    if len(rows) > app.config['SCHEDULE_MAX_SHOWTIMES']:
+        raise ValueError(f"At most {app.config['SCHEDULE_MAX_SHOWTIMES']} showtimes can be scheduled at once.")
+    return rows
+
+def schedule_showtimes(theatre, rows, skip_conflicts=False):
+    """Validate and insert many showtimes for a theatre in one transaction.
+
+    Each row has movie_id, show_date, show_time, screen ('Screen 2' or just 2) and
+    optionally total_seats. Rows are checked in memory, including for overlaps with the
+    theatre's existing showtimes and with earlier rows on the same screen, using each
+    movie's runtime. If any row fails
+    nothing is inserted, unless skip_conflicts is set, in which case the good rows are.
+    Returns (number created, one report entry per row).
+    """
+    report, showtimes = [], []
+    movie_ids = {str(row.get('movie_id')).strip() for row in rows}
+    runtimes = dict(db.session.execute(db.select(Movie.id, Movie.runtime).where(
+        Movie.id.in_([int(movie_id) for movie_id in movie_ids if movie_id.isdigit()]))).all())
+    for number, row in enumerate(rows, 1):
+        entry = {'row': number, 'status': 'ok'}
+        report.append(entry)
+        screen = str(row.get('screen') or '').strip()
+        screen = f'Screen {screen}' if screen.isdigit() else screen
+        starts_at = parse_show_datetime(str(row.get('show_date') or '').strip(), str(row.get('show_time') or '').strip())
+        try:
+            movie_id = int(row.get('movie_id'))
+            total_seats = int(row.get('total_seats') or 40)
+        except (TypeError, ValueError):
+            movie_id = total_seats = None
+        if movie_id not in runtimes:
+            entry.update(status='invalid', error='Unknown movie.')
+        elif starts_at is None:
+            entry.update(status='invalid', error='Date and time must be YYYY-MM-DD and HH:MM.')
+        elif not screen:
+            entry.update(status='invalid', error='Missing screen.')
+        elif total_seats is None or not 1 <= total_seats <= 500:
+            entry.update(status='invalid', error='Seats must be a number from 1 to 500.')
+        else:
+            showtimes.append((entry, {'movie_id': movie_id, 'theatre_id': theatre.id, 'show_date': starts_at.strftime('%Y-%m-%d'),
+                                      'show_time': starts_at.strftime('%H:%M'), 'screen': screen,
+                                      'total_seats': total_seats, 'seat_map': b'', 'starts_at': starts_at,
+                                      'ends_at': showtime_end(starts_at, runtimes[movie_id])}))
+
+    if showtimes:
+        # Overlaps: each screen keeps its shows in start order, existing ones first and then
+        # rows as they're accepted. Like find_screen_conflict, only the last show starting
+        # before a row ends can overlap it, so each check is a bisect.
+        first = min(values['starts_at'] for _, values in showtimes)
+        last = max(values['ends_at'] for _, values in showtimes)
+        screens = {}  # screen -> ([starts], [ends], [labels])
+        for showtime_id, screen, starts_at, ends_at in db.session.query(
+                Showtime.id, Showtime.screen, Showtime.starts_at, Showtime.ends_at).filter(
+                Showtime.theatre_id == theatre.id, Showtime.starts_at < last, Showtime.ends_at > first
+                ).order_by(Showtime.starts_at):
+            for values, value in zip(screens.setdefault(screen, ([], [], [])), (starts_at, ends_at, f'showtime #{showtime_id}')):
+                values.append(value)
+        for entry, values in showtimes:
+            starts, ends, labels = screens.setdefault(values['screen'], ([], [], []))
+            i = bisect.bisect_left(starts, values['ends_at']) - 1
+            if i >= 0 and ends[i] > values['starts_at']:
+                entry.update(status='conflict', error=f"Overlaps {labels[i]} from {starts[i]:%Y-%m-%d %H:%M} "
+                                                      f"to {ends[i]:%H:%M} on {values['screen']}.")
+                continue
+            i = bisect.bisect_left(starts, values['starts_at'])
+            starts.insert(i, values['starts_at'])
+            ends.insert(i, values['ends_at'])
+            labels.insert(i, f"row {entry['row']}")
+
+    failed = any(entry['status'] != 'ok' for entry in report)
+    values = [values for entry, values in showtimes if entry['status'] == 'ok']
+    if not values or (failed and not skip_conflicts):
+        return 0, report
+    # One multi-row INSERT. It bypasses the Showtime mapper events, so the rollup rows
+    # they would add are written here too.
+    table = Showtime.__table__
+    showtime_ids = db.session.execute(table.insert().returning(table.c.id, sort_by_parameter_order=True), values).scalars().all()
+    db.session.execute(ShowtimeRollup.__table__.insert(), [{'showtime_id': showtime_id} for showtime_id in showtime_ids])
+    apply_rollups(db.session, [(None, row['movie_id'], theatre.id, row['starts_at'],
+                                {'showtimes': 1, 'capacity': row['total_seats']}) for row in values])
+    db.session.commit()
+    for entry, _ in showtimes:
+        if entry['status'] == 'ok':
+            entry['status'] = 'created'
+    return len(showtime_ids), report
+
+class SeatBroadcaster:
+    """Fans seat changes out to server-sent-event subscribers.
+
+    A single background thread per process polls the seat maps and seat holds of the
+    showtimes that currently have subscribers (two queries per tick, however many
+    subscribers there are) and pushes booked/released deltas and the held seats onto
+    each subscriber's queue. Because it reads the
+    database it also picks up bookings made by other worker processes. Subscribers only
+    block on their queue, so under an evented worker (e.g. gunicorn -k gevent) thousands
+    of idle connections cost little more than their sockets.
+    """
+
+    def __init__(self, app, interval=1.0):
+        self.app = app
+        self.interval = interval
+        self._subscribers = {}  # showtime_id -> set of queues
+        self._maps = {}  # showtime_id -> last SeatMap seen
+        self._holds = {}  # showtime_id -> seats with an active hold, last seen
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def subscribe(self, showtime_id):
+        subscriber = queue.Queue(maxsize=64)
+        with self._lock:
+            self._subscribers.setdefault(showtime_id, set()).add(subscriber)
+            watched = showtime_id in self._maps
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='seat-broadcaster', daemon=True)
+                self._thread.start()
+        # New subscribers start from a full snapshot; if the showtime isn't watched yet
+        # the next poll sends one
+        if watched:
+            subscriber.put(self._snapshot(showtime_id))
+        return subscriber
+
+    def unsubscribe(self, showtime_id, subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(showtime_id)
+            if subscribers:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[showtime_id]
+                    self._maps.pop(showtime_id, None)
+                    self._holds.pop(showtime_id, None)
+
+    def _snapshot(self, showtime_id):
+        return dict(self._maps[showtime_id].to_dict(), held=sorted(self._holds.get(showtime_id, ())), snapshot=True)
+
+    def _publish(self, showtime_id, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(showtime_id, ()))
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(event)
+            except queue.Full:
+                # Slow client: throw away its backlog and let it resync from a snapshot
+                while not subscriber.empty():
+                    try:
+                        subscriber.get_nowait()
+                    except queue.Empty:
+                        break
+                subscriber.put_nowait(self._snapshot(showtime_id))
+
+    def poll(self):
+        with self._lock:
+            showtime_ids = list(self._subscribers)
+        if not showtime_ids:
+            return
+        with self.app.app_context():
+            rows = db.session.query(Showtime.id, Showtime.total_seats, Showtime.seat_map) \
+                .filter(Showtime.id.in_(showtime_ids)).all()
+            held = {}
+            for showtime_id, seat in db.session.query(SeatHold.showtime_id, SeatHold.seat_number) \
+                    .filter(SeatHold.showtime_id.in_(showtime_ids), SeatHold.expires_at > datetime.now()):
+                held.setdefault(showtime_id, set()).add(seat)
+        for showtime_id, total_seats, data in rows:
+            seat_map = SeatMap(total_seats, data)
+            holds = frozenset(held.get(showtime_id, ()))
+            previous = self._maps.get(showtime_id)
+            previous_holds = self._holds.get(showtime_id)
+            self._maps[showtime_id] = seat_map
+            self._holds[showtime_id] = holds
+            if previous is None or previous.total_seats != total_seats:
+                self._publish(showtime_id, self._snapshot(showtime_id))
+                continue
+            event = {}
+            booked, released = seat_map.diff(previous)
+            if booked or released:
+                event.update(booked=booked, released=released, available=seat_map.available_count())
+            if holds != previous_holds:
+                event['held'] = sorted(holds)
+            if event:
+                self._publish(showtime_id, event)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.poll()
+            except Exception as e:
+                self.app.logger.warning(f'Seat broadcaster poll failed: {e}')
+
+seat_broadcaster = SeatBroadcaster(app, app.config['SEAT_STREAM_POLL_INTERVAL'])
+
+# Caching
+class Cache:
+    """Base class for cache backends; counts hits and misses"""
+
+    def __init__(self, default_ttl=300, max_entries=1024):
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_set(self, key, loader, ttl=None):
+        """Return the cached value for key, calling loader() to fill it on a miss"""
+        found, value = self.get(key)
+        if found:
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = loader()
+        self.set(key, value, ttl)
+        return value
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {'backend': type(self).__name__, 'hits': self.hits, 'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0, 'entries': len(self)}
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value, ttl=None):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+class MemoryCache(Cache):
+    """In-process cache with per-entry TTL and least-recently-used eviction"""
+
+    def __init__(self, default_ttl=300, max_entries=1024):
+        super().__init__(default_ttl, max_entries)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (ttl or self.default_ttl)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+class FileSystemCache(Cache):
+    """Cache stored as pickle files, so every worker process on the host shares it"""
+
+    def __init__(self, cache_dir, default_ttl=300, max_entries=1024):
+        super().__init__(default_ttl, max_entries)
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def __len__(self):
+        return len(self._files())
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, hashlib.sha1(key.encode()).hexdigest() + '.cache')
+
+    def _files(self):
+        return [os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir) if name.endswith('.cache')]
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                expires_at, value = pickle.load(f)
+            if expires_at < time.time():
+                self.delete(key)
+                return False, None
+            os.utime(path)  # mtime doubles as the last-used time for eviction
+        except (OSError, EOFError, pickle.UnpicklingError):
+            # Missing, half-read or removed by another worker's eviction since it was read
+            return False, None
+        return True, value
+
+    def set(self, key, value, ttl=None):
+        path = self._path(key)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump((time.time() + (ttl or self.default_ttl), value), f)
+        os.replace(tmp_path, path)  # atomic, readers never see a half-written file
+        files = self._files()
+        if len(files) > self.max_entries:
+            files.sort(key=lambda p: os.path.getmtime(p) if os.path.exists(p) else 0)
+            for old_path in files[:len(files) - self.max_entries]:
+                self._remove(old_path)
+
+    def delete(self, key):
+        self._remove(self._path(key))
+
+    def clear(self):
+        for path in self._files():
+            self._remove(path)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+def create_cache(config):
+    if config['CACHE_TYPE'] == 'filesystem':
+        return FileSystemCache(config['CACHE_DIR'], config['CACHE_TTL'], config['CACHE_MAX_ENTRIES'])
+    return MemoryCache(config['CACHE_TTL'], config['CACHE_MAX_ENTRIES'])
+
+catalogue_cache = create_cache(app.config)
+
+def invalidate_catalogue(movie_id=None):
+    """Bump the catalogue version after a write, retiring the cached pages in every process.
+
+    With a movie_id only that movie's showtime listing changes version (used when seats
+    change); without one the whole catalogue does. Cached data is keyed by version, so
+    the bump reaches every worker. Call after committing the write: the version bump is
+    committed on its own. The write has already succeeded by then, so a failed bump is
+    logged rather than raised; the stale pages age out of the cache within CACHE_TTL.
+    Bookings bump their movie's version in their own transaction instead.
+    """
+    if movie_id is None:
+        catalogue_cache.clear()  # nothing cached here can be served again, free it now
+    try:
+        bump_catalogue_version('catalogue' if movie_id is None else f'movie:{movie_id}')
+        db.session.commit()
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        app.logger.warning(f'Catalogue version bump failed: {e}')
+
+def bump_catalogue_version(key):
+    table = CatalogueVersion.__table__
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    result = db.session.execute(table.update().where(table.c.key == key).values(version=table.c.version + 1, updated_at=now))
+    if result.rowcount == 0:
+        try:
+            with db.session.begin_nested():
+                db.session.execute(table.insert().values(key=key, version=1, updated_at=now))
+        except IntegrityError:
+            bump_catalogue_version(key)  # created by a concurrent write
+
+def catalogue_page(keys, render):
+    """Serve a catalogue page with an ETag and Last-Modified, or a 304 if the client's copy is current.
+
+    The validators come from the versions under keys, the user (pages show their
+    sidebar) and the CACHE_TTL period (showtimes drop off the pages as they start),
+    so a 304 costs one small query and skips the cache lookup and rendering.
+    render is called with the versions as a string to put in its cache keys, so the
+    body always matches the ETag, whichever process wrote to the catalogue.
+    """
+    versions = {key: (version, updated_at) for key, version, updated_at in db.session.query(
+        CatalogueVersion.key, CatalogueVersion.version, CatalogueVersion.updated_at).filter(CatalogueVersion.key.in_(keys))}
+    version = '.'.join(str(versions.get(key, (0,))[0]) for key in keys)
+    if session.get('_flashes'):
+        return render(version)  # pending messages have to be rendered
+    period = int(time.time() // app.config['CACHE_TTL'])
+    etag = hashlib.sha1(repr((version, current_user.get_id(), period)).encode()).hexdigest()[:24]
+    last_modified = max([updated_at for _, updated_at in versions.values()] +
+                        [datetime.fromtimestamp(period * app.config['CACHE_TTL'], timezone.utc).replace(tzinfo=None)])
+    if is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        response = make_response(render(version))
+    else:
+        response = Response(status=304)
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.cache_control.private = True
+    response.cache_control.no_cache = True  # browsers keep the page but check back each time
+    response.vary.add('Cookie')
+    return response
+
+def movie_to_dict(movie):
+    return {'id': movie.id, 'title': movie.title, 'director': movie.director, 'release_year': movie.release_year,
+            'genre': movie.genre, 'rating': movie.rating, 'poster_url': movie.poster_url}
+
+def load_catalogue():
+    """Movies plus up to two theatre names per movie, as plain data for caching"""
+    movies = Movie.query.all()
+    # Get theatre names for every movie in one query instead of one per movie
+    movie_theatres = {movie.id: [] for movie in movies}
+    rows = db.session.query(Showtime.movie_id, Theatre.name).join(Theatre, Showtime.theatre_id == Theatre.id) \
+        .distinct().order_by(Showtime.movie_id, Theatre.name).all()
+    for movie_id, theatre_name in rows:
+        theatres = movie_theatres.setdefault(movie_id, [])
+        if len(theatres) < 2:  # Show max 2 theatres
+            theatres.append(theatre_name)
+    facets = {'genres': sorted({movie.genre for movie in movies}),
+              'years': sorted({movie.release_year for movie in movies}, reverse=True)}
+    return [movie_to_dict(movie) for movie in movies], movie_theatres, facets
+
+def load_movie_listing(movie_id):
+    """A movie and its showtimes (with seats left), as plain data for caching"""
+    movie = Movie.query.get(movie_id)
+    if movie is None:
+        return None
+    showtimes = Showtime.upcoming().filter_by(movie_id=movie.id).options(db.joinedload(Showtime.theatre)) \
+        .order_by(Showtime.starts_at).all()
+    return movie_to_dict(movie), [{
+        'id': s.id, 'show_date': s.show_date, 'show_time': s.show_time, 'screen': s.screen,
+        'theatre': {'name': s.theatre.name} if s.theatre else None,
+        'seats_left': s.get_seat_map().available_count(),
+    } for s in showtimes]
+
+# Search
+# movie_fts is an SQLite FTS5 index over title, director and genre, keyed by movie id.
+# It is kept in step by the Movie mapper events below; if FTS5 isn't available (or the
+# database isn't SQLite) search falls back to LIKE matching.
+movie_fts = db.table('movie_fts', db.column('rowid'), db.column('rank'))
+_fts_enabled = None
+
+def fts_enabled(connection=None):
+    global _fts_enabled
+    if _fts_enabled is None:
+        if connection is None:
+            with db.engine.connect() as conn:
+                _fts_enabled = db.inspect(conn).has_table('movie_fts')
+        else:
+            _fts_enabled = db.inspect(connection).has_table('movie_fts')
+    return _fts_enabled
+
+@event.listens_for(Movie, 'after_insert')
+@event.listens_for(Movie, 'after_update')
+def _index_movie(mapper, connection, movie):
+    if fts_enabled(connection):
+        connection.execute(db.text('DELETE FROM movie_fts WHERE rowid = :id'), {'id': movie.id})
+        connection.execute(db.text('INSERT INTO movie_fts (rowid, title, director, genre) '
+                                   'VALUES (:id, :title, :director, :genre)'),
+                           {'id': movie.id, 'title': movie.title, 'director': movie.director, 'genre': movie.genre})
+
+@event.listens_for(Movie, 'after_delete')
+def _unindex_movie(mapper, connection, movie):
+    if fts_enabled(connection):
+        connection.execute(db.text('DELETE FROM movie_fts WHERE rowid = :id'), {'id': movie.id})
+
+def fts_query(text):
+    """Turn free text into an FTS5 query: every word must match, as a prefix"""
+    words = re.findall(r'\w+', text)
+    return ' '.join(f'"{word}"*' for word in words)
+
+def search_movies(q='', genre=None, year=None, min_rating=None, page=1, per_page=24):
+    """Full-text search over the catalogue with facet counts.
+
+    Returns a dict with one page of results (plain dicts), the total number of matches
+    and genre/year/rating facet counts over all matches.
+    """
+    criteria = []
+    order_by = [Movie.rating.desc(), Movie.title]
+    query = db.select(Movie)
+    words = fts_query(q or '')
+    if words:
+        if fts_enabled():
+            query = query.join(movie_fts, movie_fts.c.rowid == Movie.id)
+            criteria.append(db.text('movie_fts MATCH :words').bindparams(words=words))
+            order_by = [movie_fts.c.rank]
+        else:
+            for word in re.findall(r'\w+', q):
+                pattern = f'%{word}%'
+                criteria.append(db.or_(Movie.title.ilike(pattern), Movie.director.ilike(pattern), Movie.genre.ilike(pattern)))
+    if genre:
+        criteria.append(Movie.genre == genre)
+    if year:
+        criteria.append(Movie.release_year == year)
+    if min_rating is not None:
+        criteria.append(Movie.rating >= min_rating)
+    query = query.where(*criteria)
+
+    matching_ids = query.with_only_columns(Movie.id)
+    rating_bucket = db.cast(Movie.rating, db.Integer)
+    facets = {}
+    for name, column in (('genre', Movie.genre), ('year', Movie.release_year), ('rating', rating_bucket)):
+        rows = db.session.execute(db.select(column, func.count()).where(Movie.id.in_(matching_ids))
+                                  .group_by(column).order_by(column)).all()
+        facets[name] = {str(value): count for value, count in rows}
+    total = sum(facets['genre'].values())
+
+    movies = db.session.scalars(query.order_by(*order_by).limit(per_page).offset((page - 1) * per_page)).all()
+    return {'total': total, 'page': page, 'per_page': per_page,
+            'pages': (total + per_page - 1) // per_page,
+            'results': [movie_to_dict(movie) for movie in movies], 'facets': facets}
+
+# Instrumentation
+class Metrics:
+    """Per-endpoint request latency, SQL and template timings for this process.
+
+    Fed by Flask request hooks and SQLAlchemy cursor events. Only a sample of requests
+    (METRICS_SAMPLE_RATE) is instrumented, and recording is a few additions under a
+    lock, so it is cheap enough to leave on in production.
+    """
+    BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, float('inf'))
+
+    def __init__(self, slow_queries=20):
+        self.slow_queries = slow_queries
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.endpoints = {}
+            self._slowest = []  # min-heap of (ms, statement, endpoint)
+            self.started_at = time.time()
+
+    def record_request(self, endpoint, method, status, duration_ms, queries, query_ms, template_ms):
+        with self._lock:
+            stats = self.endpoints.get(endpoint)
+            if stats is None:
+                stats = self.endpoints[endpoint] = {
+                    'requests': 0, 'errors': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                    'buckets': [0] * len(self.BUCKETS_MS), 'queries': 0, 'max_queries': 0,
+                    'query_ms': 0.0, 'template_ms': 0.0, 'methods': set(),
+                }
+            stats['requests'] += 1
+            stats['errors'] += status >= 500
+            stats['total_ms'] += duration_ms
+            stats['max_ms'] = max(stats['max_ms'], duration_ms)
+            stats['buckets'][next(i for i, le in enumerate(self.BUCKETS_MS) if duration_ms <= le)] += 1
+            stats['queries'] += queries
+            stats['max_queries'] = max(stats['max_queries'], queries)
+            stats['query_ms'] += query_ms
+            stats['template_ms'] += template_ms
+            stats['methods'].add(method)
+
+    def record_query(self, statement, duration_ms, endpoint):
+        entry = (duration_ms, ' '.join(statement.split())[:500], endpoint)
+        with self._lock:
+            if len(self._slowest) < self.slow_queries:
+                heapq.heappush(self._slowest, entry)
+            elif duration_ms > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, entry)
+
+    def _percentile(self, buckets, fraction):
+        """Upper bound of the histogram bucket holding the given fraction of requests"""
+        target = sum(buckets) * fraction
+        seen = 0
+        for count, le in zip(buckets, self.BUCKETS_MS):
+            seen += count
+            if seen >= target:
+                return le
+        return float('inf')
+
+    def summary(self):
+        with self._lock:
+            endpoints = {name: dict(stats, buckets=list(stats['buckets'])) for name, stats in self.endpoints.items()}
+            slowest = sorted(self._slowest, reverse=True)
+        rows = []
+        for name, stats in sorted(endpoints.items()):
+            requests_ = stats['requests']
+            rows.append({
+                'endpoint': name, 'methods': sorted(stats['methods']), 'requests': requests_, 'errors': stats['errors'],
+                'avg_ms': stats['total_ms'] / requests_, 'max_ms': stats['max_ms'],
+                'p50_ms': self._percentile(stats['buckets'], 0.5), 'p95_ms': self._percentile(stats['buckets'], 0.95),
+                'p99_ms': self._percentile(stats['buckets'], 0.99),
+                'avg_queries': stats['queries'] / requests_, 'max_queries': stats['max_queries'],
+                'avg_query_ms': stats['query_ms'] / requests_, 'avg_template_ms': stats['template_ms'] / requests_,
+                'buckets': stats['buckets'],
+            })
+        return {'endpoints': rows, 'slowest_queries': [
+            {'ms': ms, 'statement': statement, 'endpoint': endpoint} for ms, statement, endpoint in slowest]}
+
+    def prometheus(self, extra=()):
+        """Render the metrics in the Prometheus text exposition format"""
+        with self._lock:
+            endpoints = {name: dict(stats, buckets=list(stats['buckets'])) for name, stats in self.endpoints.items()}
+        lines = ['# HELP cinebook_request_duration_seconds Request latency by endpoint.',
+                 '# TYPE cinebook_request_duration_seconds histogram']
+        for name, stats in sorted(endpoints.items()):
+            cumulative = 0
+            for count, le in zip(stats['buckets'], self.BUCKETS_MS):
+                cumulative += count
+                bound = '+Inf' if le == float('inf') else f'{le / 1000:g}'
+                lines.append(f'cinebook_request_duration_seconds_bucket{{endpoint="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'cinebook_request_duration_seconds_sum{{endpoint="{name}"}} {stats["total_ms"] / 1000:.6f}')
+            lines.append(f'cinebook_request_duration_seconds_count{{endpoint="{name}"}} {stats["requests"]}')
+        for metric, key, help_text, scale in (
+                ('cinebook_request_errors_total', 'errors', 'Requests that returned a 5xx status.', 1),
+                ('cinebook_sql_queries_total', 'queries', 'SQL statements executed.', 1),
+                ('cinebook_sql_duration_seconds_total', 'query_ms', 'Time spent executing SQL.', 1000),
+                ('cinebook_template_duration_seconds_total', 'template_ms', 'Time spent rendering templates.', 1000)):
+            lines += [f'# HELP {metric} {help_text}', f'# TYPE {metric} counter']
+            for name, stats in sorted(endpoints.items()):
+                value = stats[key] / scale
+                lines.append(f'{metric}{{endpoint="{name}"}} {value:g}' if scale == 1 else
+                             f'{metric}{{endpoint="{name}"}} {value:.6f}')
+        for metric, metric_type, help_text, value in extra:
+            lines += [f'# HELP {metric} {help_text}', f'# TYPE {metric} {metric_type}', f'{metric} {value}']
+        return '\n'.join(lines) + '\n'
+
+metrics = Metrics(app.config['METRICS_SLOW_QUERIES'])
+
+@app.before_request
+def _start_request_metrics():
+    if app.config['METRICS_ENABLED'] and random.random() < app.config['METRICS_SAMPLE_RATE']:
+        g.metrics = {'start': time.perf_counter(), 'queries': 0, 'query_ms': 0.0, 'template_ms': 0.0}
+
+@app.after_request
+def _record_request_metrics(response):
+    request_metrics = g.pop('metrics', None)
+    if request_metrics is not None:
+        metrics.record_request(request.endpoint or 'unknown', request.method, response.status_code,
+                               (time.perf_counter() - request_metrics['start']) * 1000, request_metrics['queries'],
+                               request_metrics['query_ms'], request_metrics['template_ms'])
+    return response
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    # Kept on the statement's own context: a statement that raises never reaches
+    # after_cursor_execute, and nothing is left behind on the pooled connection
+    context._query_start = time.perf_counter()
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _record_query_metrics(conn, cursor, statement, parameters, context, executemany):
+    duration_ms = (time.perf_counter() - context._query_start) * 1000
+    request_metrics = g.get('metrics') if g else None
+    if request_metrics is not None:
+        request_metrics['queries'] += 1
+        request_metrics['query_ms'] += duration_ms
+        metrics.record_query(statement, duration_ms, request.endpoint)
+
+@before_render_template.connect_via(app)
+def _start_template_timer(sender, template, context, **extra):
+    if g.get('metrics') is not None:
+        g.metrics.setdefault('template_start', []).append(time.perf_counter())
+
+@template_rendered.connect_via(app)
+def _record_template_metrics(sender, template, context, **extra):
+    request_metrics = g.get('metrics')
+    if request_metrics is not None and request_metrics.get('template_start'):
+        request_metrics['template_ms'] += (time.perf_counter() - request_metrics['template_start'].pop()) * 1000
+
+# Static fingerprints and compression
+_static_hashes = {}  # filename -> (mtime, content hash)
+_compressed_static = OrderedDict()  # (filename, content hash, encoding) -> bytes, small LRU
+COMPRESSIBLE_TYPES = {'text/html', 'text/css', 'text/plain', 'text/csv', 'text/javascript', 'application/javascript',
+                      'application/json', 'application/x-ndjson', 'image/svg+xml'}
+
+def static_fingerprint(filename):
+    """Short content hash of a static file, re-read only when its mtime changes"""
+    path = os.path.join(app.static_folder, filename)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    cached = _static_hashes.get(filename)
+    if cached is None or cached[0] != mtime:
+        with open(path, 'rb') as f:
+            cached = _static_hashes[filename] = (mtime, hashlib.sha256(f.read()).hexdigest()[:12])
+    return cached[1]
+
+@app.url_defaults
+def _fingerprint_static_urls(endpoint, values):
+    # url_for('static', filename=...) gets ?v=<content hash>, so a changed file gets a new URL
+    if endpoint == 'static' and 'v' not in values:
+        fingerprint = static_fingerprint(values.get('filename', ''))
+        if fingerprint:
+            values['v'] = fingerprint
+
+def _compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=min(app.config['COMPRESS_LEVEL'] + 2, 11))
+    return gzip.compress(data, compresslevel=app.config['COMPRESS_LEVEL'], mtime=0)
+
+@app.after_request
+def compress_response(response):
+    """Brotli/gzip for text responses of COMPRESS_MIN_SIZE bytes or more"""
+    if request.endpoint == 'static' and response.status_code == 200:
+        if request.args.get('v') and request.args.get('v') == static_fingerprint(request.view_args.get('filename', '')):
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = app.config['STATIC_MAX_AGE']
+            response.cache_control.immutable = True
+    response.vary.add('Accept-Encoding')
+    if (response.status_code != 200 or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_TYPES or request.method == 'HEAD'):
+        return response
+    encoding = 'br' if brotli and request.accept_encodings['br'] else 'gzip' if request.accept_encodings['gzip'] else None
+    if encoding is None:
+        return response
+    if request.endpoint == 'static' and response.direct_passthrough:
+        # Static files are compressed once per content version
+        key = (request.view_args.get('filename'), static_fingerprint(request.view_args.get('filename', '')), encoding)
+        body = _compressed_static.get(key)
+        if body is None:
+            response.direct_passthrough = False
+            data = response.get_data()
+            if len(data) < app.config['COMPRESS_MIN_SIZE']:
+                return response
+            body = _compressed_static[key] = _compress(data, encoding)
+            while len(_compressed_static) > 64:
+                _compressed_static.popitem(last=False)
+        elif hasattr(response.response, 'close'):
+            response.response.close()
+    elif response.is_streamed:
+        return response  # live streams and exports are flushed as they're produced
+    else:
+        data = response.get_data()
+        if len(data) < app.config['COMPRESS_MIN_SIZE']:
+            return response
+        body = _compress(data, encoding)
+    response.direct_passthrough = False
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)  # same content, different bytes
+    return response
+
+# Password hashing and sign-in rate limits
+class PasswordHasherBusy(Exception):
+    """No password hashing slot came free within PASSWORD_HASH_WAIT seconds"""
+
+class PasswordHasher:
+    """werkzeug password hashing in a bounded process pool.
+
+    Hashing is deliberately CPU-heavy, so at most max_pending hashes are queued or
+    running at once on `workers` processes; further callers wait up to `wait` seconds
+    for a slot and then get PasswordHasherBusy. With workers=0, or while the app is in
+    debug or testing mode, hashing happens on the calling thread, still bounded by the
+    same slots. The pool uses spawned processes, which re-import the main module, so
+    scripts that hash through it need an `if __name__ == '__main__':` guard.
+    """
+
+    def __init__(self, method, workers=0, max_pending=8, wait=5):
+        self.method = method
+        self.workers = workers
+        self.wait = wait
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pool_pid = None
+        self._prefix = None
+
+    def _executor(self):
+        with self._lock:
+            # A pool doesn't survive a fork, so each server worker process starts its own.
+            # Spawned rather than forked: forking a threaded server can deadlock the child.
+            if self._pool is None or self._pool_pid != os.getpid():
+                self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def _run(self, function, *args):
+        if not self._slots.acquire(timeout=self.wait):
+            raise PasswordHasherBusy()
+        try:
+            if not self.workers or app.debug or app.testing:
+                return function(*args)
+            return self._executor().submit(function, *args).result()
+        except BrokenProcessPool:
+            self._pool = None  # a worker died; start a fresh pool next time
+            raise
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        return bool(pwhash) and self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """Whether pwhash was made with a different method or cost than the configured one"""
+        if self._prefix is None:
+            # werkzeug fills in default costs ('scrypt' becomes 'scrypt:32768:8:1'), so let it
+            self._prefix = self.hash('').split('$', 1)[0]
+        return pwhash.split('$', 1)[0] != self._prefix
+
+class RateLimiter:
+    """Sliding-window count of events per key (a client address, an account), for this process"""
+    MAX_KEYS = 100000
+
+    def __init__(self, limit, window):
+        self.limit = limit
+        self.window = window  # seconds
+        self._events = {}  # key -> deque of the last `limit` event times, oldest first
+        self._lock = threading.Lock()
+
+    def retry_after(self, key, now=None):
+        """Seconds until key may have another event, 0 if it may now"""
+        now = now or time.monotonic()
+        with self._lock:
+            events = self._events.get(key)
+            if not events or len(events) < self.limit or events[0] <= now - self.window:
+                return 0
+            return math.ceil(events[0] + self.window - now)
+
+    def hit(self, key, now=None):
+        now = now or time.monotonic()
+        with self._lock:
+            events = self._events.get(key)
+            if events is None:
+                if len(self._events) >= self.MAX_KEYS:
+                    self._prune(now)
+                events = self._events[key] = deque(maxlen=self.limit)
+            events.append(now)
+
+    def reset(self, key):
+        with self._lock:
+            self._events.pop(key, None)
+
+    def _prune(self, now):
+        for key in [key for key, events in self._events.items() if events[-1] <= now - self.window]:
+            del self._events[key]
+
+password_hasher = PasswordHasher(app.config['PASSWORD_HASH_METHOD'], app.config['PASSWORD_HASH_WORKERS'],
+                                 app.config['PASSWORD_HASH_MAX_PENDING'], app.config['PASSWORD_HASH_WAIT'])
+ip_login_limiter = RateLimiter(*app.config['LOGIN_LIMIT_PER_IP'])
+account_login_limiter = RateLimiter(*app.config['LOGIN_LIMIT_PER_ACCOUNT'])
+
+def login_retry_after(account=None):
+    """Seconds before this account (or client) may try to sign in again, 0 to go ahead.
+
+    Checked before any hashing, so credential stuffing is turned away cheaply. The
+    account's failures (counted in verify_password) are the main limit; every attempt
+    also counts against the client address, whose higher limit only stops one client
+    working through many accounts. Behind a proxy, set TRUSTED_PROXIES so the address
+    is the client's rather than the proxy's.
+    """
+    wait = ip_login_limiter.retry_after(request.remote_addr)
+    if account is not None:
+        wait = max(wait, account_login_limiter.retry_after(account))
+    if not wait:
+        ip_login_limiter.hit(request.remote_addr)
+    return wait
+
+def verify_password(account, record, password):
+    """Check a sign-in against record.password (record may be None for an unknown account).
+
+    A correct password stored with outdated hash settings is re-hashed on the record;
+    the caller commits.
+    """
+    if record is None or not password_hasher.verify(record.password, password):
+        account_login_limiter.hit(account)
+        return False
+    account_login_limiter.reset(account)
+    if password_hasher.needs_rehash(record.password):
+        record.password = password_hasher.hash(password)
+    return True
+
+@app.errorhandler(PasswordHasherBusy)
+def password_hasher_busy(e):
+    return Response('Sign-in is busy right now. Please try again in a few seconds.', 503,
+                    {'Retry-After': str(app.config['PASSWORD_HASH_WAIT'])}, mimetype='text/plain')
+
+# Users and theatres looked up on every authenticated request. Per process, like the
+# catalogue's memory backend; entries are dropped when the account row changes and
+# otherwise expire after IDENTITY_CACHE_TTL, which bounds staleness across processes.
+identity_cache = MemoryCache(app.config['IDENTITY_CACHE_TTL'], app.config['IDENTITY_CACHE_MAX_ENTRIES'])
+
+def _detached_copy(obj):
+    """A session-free copy of obj's column values that can be shared between requests"""
+    mapper = db.inspect(type(obj))
+    copy = mapper.class_(**{attr.key: getattr(obj, attr.key) for attr in mapper.column_attrs})
+    make_transient_to_detached(copy)
+    return copy
+
+def load_identity(model, ident):
+    """The User or Theatre with this id (or None), from identity_cache when possible.
+
+    The cache holds detached copies shared by every request thread. Each caller gets its
+    own instance merged into the request's session without a query, so it can be read,
+    changed and committed like any other query result.
+    """
+    def load():
+        obj = db.session.get(model, ident)
+        return _detached_copy(obj) if obj is not None else None
+
+    cached = identity_cache.get_or_set(f'{model.__tablename__}:{ident}', load)
+    return db.session.merge(cached, load=False) if cached is not None else None
+
+@event.listens_for(User, 'after_insert')
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+@event.listens_for(Theatre, 'after_insert')
+@event.listens_for(Theatre, 'after_update')
+@event.listens_for(Theatre, 'after_delete')
+def _forget_identity(mapper, connection, obj):
+    identity_cache.delete(f'{mapper.local_table.name}:{obj.id}')
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    return load_identity(User, int(user_id))
 
 @app.route('/')
 def landing():
@@ -72,14 +1927,26 @@ def landing():
 @app.route('/home')
 @login_required
 def home():
-    movies = Movie.query.all()
-    # Get theatre info for each movie by checking their showtimes
-    movie_theatres = {}
-    for movie in movies:
-        showtimes = Showtime.query.filter_by(movie_id=movie.id).options(db.joinedload(Showtime.theatre)).all()
-        theatres = list(set([s.theatre.name for s in showtimes if s.theatre]))
-        movie_theatres[movie.id] = theatres[:2]  # Show max 2 theatres
-    return render_template('index.html', movies=movies, movie_theatres=movie_theatres)
+    return catalogue_page(['catalogue'], render_home)
+
+def render_home(version):
+    movies, movie_theatres, facets = catalogue_cache.get_or_set(f'catalogue:{version}', load_catalogue)
+    search = None
+    if request.args.get('q') or request.args.get('genre') or request.args.get('year'):
+        search = search_movies(request.args.get('q', ''), request.args.get('genre') or None,
+                               request.args.get('year', type=int), page=max(request.args.get('page', 1, type=int), 1),
+                               per_page=app.config['SEARCH_PER_PAGE'])
+        movies = search['results']
+    return render_template('index.html', movies=movies, movie_theatres=movie_theatres, facets=facets, search=search)
+
+@app.route('/search')
+@login_required
+def search():
+    """JSON search API: ?q=&genre=&year=&min_rating=&page=&per_page="""
+    per_page = min(max(request.args.get('per_page', app.config['SEARCH_PER_PAGE'], type=int), 1), 100)
+    return jsonify(search_movies(request.args.get('q', ''), request.args.get('genre') or None,
+                                 request.args.get('year', type=int), request.args.get('min_rating', type=float),
+                                 page=max(request.args.get('page', 1, type=int), 1), per_page=per_page))
 
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -88,8 +1955,13 @@ def login():
     if request.method == 'POST':
         email = request.form['email']
         password = request.form['password']
+        wait = login_retry_after(f'user:{email.lower()}')
+        if wait:
+            flash(f'Too many sign-in attempts. Please try again in {wait} seconds.')
+            return render_template('login.html'), 429
         user = User.query.filter_by(email=email).first()
-        if user and user.password and check_password_hash(user.password, password):
+        if verify_password(f'user:{email.lower()}', user, password):
+            db.session.commit()  # saves a re-hashed password
             login_user(user)
             return redirect(url_for('home'))
         flash('Invalid email or password')
@@ -109,6 +1981,10 @@ def register():
         email = request.form['email']
         password = request.form['password']
         username = request.form.get('username', email.split('@')[0])  # Use email prefix as default username
+        wait = login_retry_after()
+        if wait:
+            flash(f'Too many attempts. Please try again in {wait} seconds.')
+            return render_template('register.html'), 429
         
         # Validate Gmail address
         if not email.endswith('@gmail.com'):
@@ -118,7 +1994,7 @@ def register():
         if User.query.filter_by(email=email).first():
             flash('Email already exists')
             return redirect(url_for('register'))
-        hashed_password = generate_password_hash(password)
+        hashed_password = password_hasher.hash(password)
         new_user = User(email=email, username=username, password=hashed_password)
         db.session.add(new_user)
         db.session.commit()
@@ -129,62 +2005,163 @@ def register():
 @app.route('/movie/<int:movie_id>')
 @login_required
 def movie_details(movie_id):
-    movie = Movie.query.get_or_404(movie_id)
-    showtimes = Showtime.query.filter_by(movie_id=movie.id).options(db.joinedload(Showtime.theatre)).all()
-    return render_template('movie_details.html', movie=movie, showtimes=showtimes)
+    def render(version):
+        listing = catalogue_cache.get_or_set(f'movie:{movie_id}:{version}', lambda: load_movie_listing(movie_id))
+        if listing is None:
+            abort(404)
+        movie, showtimes = listing
+        return render_template('movie_details.html', movie=movie, showtimes=showtimes)
+    return catalogue_page(['catalogue', f'movie:{movie_id}'], render)
 
 @app.route('/book_seats/<int:showtime_id>', methods=['GET', 'POST'])
 @login_required
 def book_seats(showtime_id):
     showtime = Showtime.query.get_or_404(showtime_id)
-    booked = showtime.booked_seats.split(',') if showtime.booked_seats else []
     total_seats = showtime.total_seats
-    seat_numbers = [str(i+1) for i in range(total_seats)]
+    seat_numbers = list(range(1, total_seats + 1))
 
     if request.method == 'POST':
-        selected_seats = request.form.getlist('seats')
-        # Prevent double-booking
-        if any(seat in booked for seat in selected_seats):
-            flash('Some selected seats are already booked. Please choose different seats.')
+        # The seat page submits with fetch and asks for JSON so a failed booking
+        # doesn't need a redirect and full re-render
+        wants_json = request.accept_mimetypes.best == 'application/json'
+        try:
+            selected_seats = [int(seat) for seat in request.form.getlist('seats')]
+        except ValueError:
+            selected_seats = []
+        selected_seats = [seat for seat in selected_seats if 1 <= seat <= total_seats]
+        if not selected_seats:
+            if wants_json:
+                return jsonify(ok=False, error='Please select at least one seat.'), 400
+            flash('Please select at least one seat.')
+            return redirect(url_for('book_seats', showtime_id=showtime_id))
+        # Prevent double-booking (checked by the database, not here)
+        try:
+            reserve_seats(showtime, current_user.id, selected_seats)
+        except SeatConflictError:
+            if wants_json:
+                db.session.refresh(showtime)
+                seat_map = showtime.get_seat_map()
+                holds = active_seat_holds(showtime_id)
+                return jsonify(ok=False, error='Some selected seats are already taken. Please choose different seats.',
+                               taken=[seat for seat in selected_seats
+                                      if seat in seat_map or holds.get(seat, current_user.id) != current_user.id]), 409
+            flash('Some selected seats are already taken. Please choose different seats.')
             return redirect(url_for('book_seats', showtime_id=showtime_id))
-        # Update booked seats
-        all_booked = booked + selected_seats
-        showtime.booked_seats = ','.join(all_booked)
-        booking = Booking(user_id=current_user.id, showtime_id=showtime.id, seats=','.join(selected_seats))
-        db.session.add(booking)
-        db.session.commit()
         flash('Booking successful!')
+        if wants_json:
+            return jsonify(ok=True, redirect=url_for('movie_details', movie_id=showtime.movie_id))
         return redirect(url_for('movie_details', movie_id=showtime.movie_id))
-    return render_template('book_seats.html', showtime=showtime, seat_numbers=seat_numbers, booked=booked)
+    holds = active_seat_holds(showtime_id)
+    return render_template('book_seats.html', showtime=showtime, seat_numbers=seat_numbers, booked=showtime.get_seat_map(),
+                           held={seat for seat, user_id in holds.items() if user_id != current_user.id},
+                           my_holds={seat for seat, user_id in holds.items() if user_id == current_user.id},
+                           hold_ttl=app.config['SEAT_HOLD_TTL'])
+
+@app.route('/api/showtimes/<int:showtime_id>/seats')
+@login_required
+def showtime_seats(showtime_id):
+    showtime = Showtime.query.get_or_404(showtime_id)
+    holds = active_seat_holds(showtime_id)
+    return jsonify(dict(showtime.get_seat_map().to_dict(),
+                        held=sorted(seat for seat, user_id in holds.items() if user_id != current_user.id),
+                        mine=sorted(seat for seat, user_id in holds.items() if user_id == current_user.id)))
+
+@app.route('/api/showtimes/<int:showtime_id>/holds', methods=['POST'])
+@login_required
+def showtime_holds(showtime_id):
+    """Hold the posted seats for the current user (replacing their previous selection)"""
+    showtime = Showtime.query.get_or_404(showtime_id)
+    try:
+        seats = [int(seat) for seat in request.form.getlist('seats')]
+    except ValueError:
+        abort(400)
+    if any(not 1 <= seat <= showtime.total_seats for seat in seats):
+        abort(400)
+    if len(set(seats)) > app.config['SEAT_HOLD_MAX_SEATS']:
+        return jsonify(ok=False, error=f"You can hold at most {app.config['SEAT_HOLD_MAX_SEATS']} seats."), 400
+    try:
+        held, taken, expires_at = hold_seats(showtime, current_user.id, seats)
+    except SeatConflictError as e:
+        return jsonify(ok=False, error=str(e)), 409
+    return jsonify(ok=True, held=held, taken=taken, expires_in=app.config['SEAT_HOLD_TTL'],
+                   expires_at=expires_at.isoformat(timespec='seconds'))
+
+@app.route('/api/showtimes/<int:showtime_id>/seats/stream')
+@login_required
+def showtime_seats_stream(showtime_id):
+    """Server-sent events with seat deltas ({"booked": [...], "released": [...]}) for one showtime.
+
+    The stream closes after SEAT_STREAM_MAX_AGE seconds so it can't hold a sync worker
+    indefinitely; EventSource reconnects on its own and starts again from a snapshot.
+    """
+    Showtime.query.get_or_404(showtime_id)
+    keepalive = app.config['SEAT_STREAM_KEEPALIVE']
+    deadline = time.monotonic() + app.config['SEAT_STREAM_MAX_AGE']
+
+    def events():
+        subscriber = seat_broadcaster.subscribe(showtime_id)
+        try:
+            yield 'retry: 3000\n\n'
+            while (remaining := deadline - time.monotonic()) > 0:
+                try:
+                    event = subscriber.get(timeout=min(keepalive, remaining))
+                except queue.Empty:
+                    yield ': keep-alive\n\n'
+                    continue
+                yield f'event: seats\ndata: {json.dumps(event)}\n\n'
+        finally:
+            seat_broadcaster.unsubscribe(showtime_id, subscriber)
+
+    return Response(events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 from sqlalchemy.orm import joinedload
 
+def _booking_time_bound(moment):
+    # booking_time defaults to CURRENT_TIMESTAMP, stored as 'YYYY-MM-DD HH:MM:SS' text; a bound
+    # datetime is sent with '.000000' appended and compares after it, so send the same format
+    return db.literal(str(moment), db.String)
+
 @app.route('/my_bookings')
 @login_required
 def my_bookings():
-    month = request.args.get('month')
-    query = Booking.query.filter_by(user_id=current_user.id)
-    if month:
-        # Filter by month (YYYY-MM)
-        query = query.filter(db.extract('year', Booking.booking_time) == int(month[:4]),
-                            db.extract('month', Booking.booking_time) == int(month[5:7]))
-    bookings = query.order_by(Booking.booking_time.desc()).all()
-    # Get all months with bookings for dropdown
-    all_months = db.session.query(db.func.strftime('%Y-%m', Booking.booking_time)).filter_by(user_id=current_user.id).distinct().all()
-    all_months = [m[0] for m in all_months]
-    from datetime import datetime
-    now = datetime.now().strftime('%Y-%m-%d %H:%M')
-    return render_template('my_bookings.html', bookings=bookings, all_months=all_months, selected_month=month, now=now)
+    month = request.args.get('month') or None
+    try:
+        start = datetime.strptime(month, '%Y-%m') if month else None
+        before_time = datetime.fromisoformat(request.args['before_time']) if request.args.get('before_time') else None
+    except ValueError:
+        abort(400)
+    query = Booking.query.filter(Booking.user_id == current_user.id) \
+        .options(joinedload(Booking.showtime).joinedload(Showtime.movie))
+    if start:
+        # Half-open [first of the month, first of the next) range on the (user_id, booking_time) index
+        query = query.filter(Booking.booking_time >= _booking_time_bound(start),
+                             Booking.booking_time < _booking_time_bound(next_month(start)))
+    before_id = request.args.get('before', type=int)
+    if before_time and before_id:
+        # Keyset pagination on (booking_time, id): every page is one short index range scan.
+        # The cursor row's stored booking_time is compared while it still exists.
+        cursor_time = func.coalesce(db.select(Booking.booking_time).where(Booking.id == before_id).scalar_subquery(),
+                                    _booking_time_bound(before_time))
+        query = query.filter(db.tuple_(Booking.booking_time, Booking.id) < db.tuple_(cursor_time, before_id))
+    bookings = query.order_by(Booking.booking_time.desc(), Booking.id.desc()).limit(BOOKINGS_PER_PAGE + 1).all()
+    next_page = None
+    if len(bookings) > BOOKINGS_PER_PAGE:
+        bookings = bookings[:BOOKINGS_PER_PAGE]
+        next_page = {'before': bookings[-1].id, 'before_time': bookings[-1].booking_time.isoformat()}
+    all_months = [m.strftime('%Y-%m') for m in db.session.scalars(
+        db.select(UserBookingMonth.month).where(UserBookingMonth.user_id == current_user.id)
+        .order_by(UserBookingMonth.month.desc()))]
+    now = datetime.now()
+    return render_template('my_bookings.html', bookings=bookings, all_months=all_months, selected_month=month,
+                           next_page=next_page, first_page=before_id is None, now=now)
 
 @app.route('/profile')
 @login_required
 def profile():
-    total_tickets = db.session.query(func.count(Booking.id)).filter_by(user_id=current_user.id).scalar() or 0
-    # Assume Rs. 200 per ticket (each seat)
-    bookings = Booking.query.filter_by(user_id=current_user.id).all()
-    total_seats = sum(len(b.seats.split(',')) for b in bookings)
-    total_amount = total_seats * 200
-    return render_template('profile.html', total_tickets=total_seats, total_amount=total_amount)
+    summary = db.session.get(UserBookingSummary, current_user.id) or UserBookingSummary(seats=0, spend=0)
+    return render_template('profile.html', total_tickets=summary.seats, total_amount=summary.spend,
+                           last_booking_at=summary.last_booking_at)
 
 @app.route('/delete_booking/<int:booking_id>', methods=['POST'])
 @login_required
@@ -192,7 +2169,7 @@ def delete_booking(booking_id):
     booking = Booking.query.get_or_404(booking_id)
     if booking.user_id != current_user.id:
         abort(403)
-    db.session.delete(booking)
+    cancel_booking(booking)
     db.session.commit()
     flash('Booking deleted successfully.', 'success')
     return redirect(url_for('my_bookings'))
@@ -200,17 +2177,12 @@ def delete_booking(booking_id):
 @app.route('/delete_multiple_bookings', methods=['POST'])
 @login_required
 def delete_multiple_bookings():
-    from datetime import datetime
-    now = datetime.now().strftime('%Y-%m-%d %H:%M')
-    ids = request.form.getlist('delete_ids')
-    deleted = 0
-    for bid in ids:
-        booking = Booking.query.get(bid)
-        if booking and booking.user_id == current_user.id:
-            showtime_dt = booking.showtime.show_date + ' ' + booking.showtime.show_time
-            if showtime_dt < now:
-                db.session.delete(booking)
-                deleted += 1
+    ids = request.form.getlist('delete_ids', type=int)
+    # Only the user's own bookings for shows that have already started can be deleted.
+    # Past shows aren't in the cached listings, so there is nothing to invalidate.
+    booking_ids = db.session.scalars(db.select(Booking.id).join(Showtime).where(
+        Booking.id.in_(ids), Booking.user_id == current_user.id, Showtime.starts_at < datetime.now())).all()
+    deleted = delete_bookings(booking_ids)
     db.session.commit()
     if deleted:
         flash(f'{deleted} booking(s) deleted.', 'success')
@@ -218,14 +2190,109 @@ def delete_multiple_bookings():
         flash('No bookings deleted.', 'warning')
     return redirect(url_for('my_bookings'))
 
+def paginate_bookings(query, before=None, per_page=BOOKINGS_PER_PAGE):
+    """Return one page of bookings, newest first, and the cursor for the next page.
+
+    Uses keyset pagination on Booking.id (ids grow with booking_time), so deep pages
+    cost the same as the first one. User, showtime and movie are loaded in the same
+    query so rendering a row doesn't trigger any extra queries.
+    """
+    query = query.options(joinedload(Booking.user), joinedload(Booking.showtime).joinedload(Showtime.movie))
+    if before:
+        query = query.filter(Booking.id < before)
+    bookings = query.order_by(Booking.id.desc()).limit(per_page + 1).all()
+    next_cursor = bookings[per_page - 1].id if len(bookings) > per_page else None
+    return bookings[:per_page], next_cursor
+
+def paginate_by_id(query, model, after=None, per_page=BOOKINGS_PER_PAGE):
+    """Return one page of rows in id order and the cursor for the next page (keyset on id)"""
+    if after:
+        query = query.filter(model.id > after)
+    rows = query.order_by(model.id).limit(per_page + 1).all()
+    next_cursor = rows[per_page - 1].id if len(rows) > per_page else None
+    return rows[:per_page], next_cursor
+
+EXPORT_COLUMNS = ('booking_id', 'booking_time', 'user_email', 'movie', 'theatre', 'show_date', 'show_time',
+                  'screen', 'seats', 'seat_count', 'amount', 'archived')
+
+def booking_export_query(theatre_id=None, start=None, end=None, include_archived=False):
+    """Bookings joined with user, showtime, movie and theatre, oldest first.
+
+    The theatre and booking_time [start, end) filters are part of the SQL, so only the
+    rows being exported are read. Archived bookings are added with include_archived.
+    """
+    def select_bookings(table, id_column, archived):
+        query = (db.select(id_column.label('booking_id'), table.c.booking_time, User.email, Movie.title, Theatre.name, Showtime.show_date,
+                           Showtime.show_time, Showtime.screen, table.c.seats, table.c.seat_count,
+                           (table.c.seat_count * TICKET_PRICE).label('amount'), db.literal(archived).label('archived'))
+                 .select_from(table).join(User, User.id == table.c.user_id)
+                 .join(Showtime, Showtime.id == table.c.showtime_id).join(Movie, Movie.id == Showtime.movie_id)
+                 .join(Theatre, Theatre.id == Showtime.theatre_id))
+        if theatre_id is not None:
+            query = query.where(Showtime.theatre_id == theatre_id)
+        if start is not None:
+            query = query.where(table.c.booking_time >= _booking_time_bound(start))
+        if end is not None:
+            query = query.where(table.c.booking_time < _booking_time_bound(end))
+        return query
+
+    query = select_bookings(Booking.__table__, Booking.__table__.c.id, 0)
+    if include_archived:
+        query = db.union_all(query, select_bookings(BookingArchive.__table__, BookingArchive.__table__.c.booking_id, 1))
+    return query.order_by(db.literal_column('booking_time'), db.literal_column('booking_id'))
+
+def stream_booking_export(query, fmt):
+    """Yield a CSV or NDJSON export in chunks of EXPORT_BATCH_SIZE rows.
+
+    Rows come from the database in batches (yield_per) and each chunk is written out
+    before the next is fetched, so memory stays flat however many bookings there are.
+    """
+    result = db.session.execute(query.execution_options(yield_per=app.config['EXPORT_BATCH_SIZE']))
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if fmt == 'csv':
+        writer.writerow(EXPORT_COLUMNS)
+    for rows in result.partitions():
+        for row in rows:
+            row = list(row)
+            row[1] = row[1].isoformat(sep=' ', timespec='seconds')
+            if fmt == 'csv':
+                writer.writerow(row)
+            else:
+                buffer.write(json.dumps(dict(zip(EXPORT_COLUMNS, row))) + '\n')
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def booking_export_response(fmt, theatre_id=None):
+    """Streamed booking export; ?start=&end= (YYYY-MM-DD, inclusive) filter by booking date"""
+    try:
+        start = datetime.strptime(request.args['start'], '%Y-%m-%d') if request.args.get('start') else None
+        end = datetime.strptime(request.args['end'], '%Y-%m-%d') + timedelta(days=1) if request.args.get('end') else None
+    except ValueError:
+        abort(400)
+    query = booking_export_query(theatre_id, start, end, request.args.get('archived') == '1')
+    name = '-'.join(['bookings', f'theatre{theatre_id}' if theatre_id else 'all'] +
+                    [request.args[key] for key in ('start', 'end') if request.args.get(key)])
+    return Response(stream_with_context(stream_booking_export(query, fmt)),
+                    mimetype='text/csv' if fmt == 'csv' else 'application/x-ndjson',
+                    headers={'Content-Disposition': f'attachment; filename={name}.{fmt}'})
+
 # --- Theatre Owner Panel ---
 @app.route('/theatre/login', methods=['GET', 'POST'])
 def theatre_login():
     if request.method == 'POST':
         email = request.form['email']
         password = request.form['password']
+        wait = login_retry_after(f'theatre:{email.lower()}')
+        if wait:
+            flash(f'Too many sign-in attempts. Please try again in {wait} seconds.')
+            return render_template('theatre_login.html'), 429
         theatre = Theatre.query.filter_by(email=email).first()
-        if theatre and check_password_hash(theatre.password, password):
+        if verify_password(f'theatre:{email.lower()}', theatre, password):
+            db.session.commit()  # saves a re-hashed password
             session['theatre_logged_in'] = theatre.id
             session['theatre_name'] = theatre.name
             flash(f'Welcome {theatre.owner_name}!')
@@ -246,6 +2313,11 @@ def theatre_required(f):
     def decorated_function(*args, **kwargs):
         if not session.get('theatre_logged_in'):
             return redirect(url_for('theatre_login'))
+        g.theatre = load_identity(Theatre, session['theatre_logged_in'])
+        if g.theatre is None:  # deleted while logged in
+            session.pop('theatre_logged_in', None)
+            session.pop('theatre_name', None)
+            return redirect(url_for('theatre_login'))
         return f(*args, **kwargs)
     return decorated_function
 
@@ -253,28 +2325,32 @@ def theatre_required(f):
 @theatre_required
 def theatre_dashboard():
     theatre_id = session.get('theatre_logged_in')
-    theatre = Theatre.query.get(theatre_id)
+    theatre = g.theatre
     movies = Movie.query.all()
-    showtimes = Showtime.query.filter_by(theatre_id=theatre_id).all()
-    bookings = Booking.query.join(Showtime).filter(Showtime.theatre_id == theatre_id).all()
-    
-    # Get unique movies for this theatre
-    unique_movie_ids = set([s.movie_id for s in showtimes])
-    total_movies = len(unique_movie_ids)
+    showtimes = Showtime.query.filter_by(theatre_id=theatre_id).options(joinedload(Showtime.movie)).all()
+    bookings, next_cursor = paginate_bookings(Booking.query.join(Showtime).filter(Showtime.theatre_id == theatre_id),
+                                              before=request.args.get('before', type=int))
+
+    # Sales figures come from the rollups, so they cost the same however many bookings there are
+    showtime_bookings = dict(db.session.query(ShowtimeRollup.showtime_id, ShowtimeRollup.bookings)
+                             .join(Showtime).filter(Showtime.theatre_id == theatre_id).all())
+    total_bookings, total_seats_booked, revenue = sales_totals(Showtime.theatre_id == theatre_id)
+    today = datetime.now().date()
+    # Seats on sale for shows from today on
+    total_seat_capacity = db.session.query(func.coalesce(func.sum(TheatreDailyRollup.capacity), 0)) \
+        .filter(TheatreDailyRollup.theatre_id == theatre_id, TheatreDailyRollup.day >= today).scalar()
+    trend = rollup_series(TheatreDailyRollup, today - timedelta(days=13), today + timedelta(days=8), theatre_id=theatre_id)
+
+    total_movies = len(set(s.movie_id for s in showtimes))
     total_showtimes = len(showtimes)
-    total_bookings = len(bookings)
-    # Calculate revenue based on actual booked seats
-    total_seats_booked = sum(len(booking.seats.split(',')) for booking in bookings)
-    revenue = total_seats_booked * 200
-    # Theatre's total seat capacity (fixed capacity based on screens)
-    total_seat_capacity = theatre.total_screens * 40  # Assuming 40 seats per screen
     
     return render_template('theatre_dashboard.html', 
                          theatre=theatre, movies=movies, showtimes=showtimes, 
-                         bookings=bookings, total_movies=total_movies,
+                         bookings=bookings, next_cursor=next_cursor,
+                         showtime_bookings=showtime_bookings, total_movies=total_movies,
                          total_showtimes=total_showtimes, total_bookings=total_bookings,
                          revenue=revenue, total_seat_capacity=total_seat_capacity,
-                         total_seats_booked=total_seats_booked)
+                         total_seats_booked=total_seats_booked, trend=trend)
 
 @app.route('/theatre/add_movie', methods=['POST'])
 @theatre_required
@@ -285,11 +2361,13 @@ def theatre_add_movie():
     genre = request.form['genre']
     rating = float(request.form['rating'])
     poster_url = request.form['poster_url']
+    runtime = parse_runtime(request.form.get('runtime'))
     
     movie = Movie(title=title, director=director, release_year=release_year,
-                  genre=genre, rating=rating, poster_url=poster_url)
+                  genre=genre, rating=rating, poster_url=poster_url, runtime=runtime)
     db.session.add(movie)
     db.session.commit()
+    invalidate_catalogue()
     flash('Movie added successfully!')
     return redirect(url_for('theatre_dashboard'))
 
@@ -304,11 +2382,75 @@ def theatre_add_showtime():
     
     showtime = Showtime(movie_id=movie_id, theatre_id=theatre_id, 
                        show_date=show_date, show_time=show_time, screen=screen)
+    conflict = screen_conflict_message(showtime)
+    if conflict:
+        flash(conflict)
+        return redirect(url_for('theatre_dashboard'))
     db.session.add(showtime)
     db.session.commit()
+    invalidate_catalogue()
     flash('Showtime added successfully!')
     return redirect(url_for('theatre_dashboard'))
 
+@app.route('/theatre/schedule', methods=['POST'])
+@theatre_required
+def theatre_schedule():
+    """Create many showtimes at once from a recurrence or a CSV/JSON upload"""
+    return schedule_response(g.theatre, 'theatre_dashboard')
+
+@app.route('/api/theatres/<int:theatre_id>/free_slots')
+def theatre_free_slots(theatre_id):
+    """Free time on a screen for a day: ?screen=2&date=YYYY-MM-DD, optionally ?movie_id= or ?minutes="""
+    # Admins see every theatre, a theatre only itself
+    if not session.get('admin_logged_in') and session.get('theatre_logged_in') != theatre_id:
+        abort(403)
+    screen = request.args.get('screen', '').strip()
+    screen = f'Screen {screen}' if screen.isdigit() else screen
+    try:
+        day = datetime.strptime(request.args.get('date', ''), '%Y-%m-%d').date()
+        minutes = int(request.args.get('minutes', 0))
+    except ValueError:
+        abort(400)
+    if not screen:
+        abort(400)
+    if request.args.get('movie_id'):
+        movie = Movie.query.get_or_404(request.args.get('movie_id', type=int))
+        minutes = movie.runtime or app.config['DEFAULT_RUNTIME_MINUTES']
+    slots = free_screen_slots(theatre_id, screen, day, minutes)
+    return jsonify(theatre_id=theatre_id, screen=screen, date=day.isoformat(), minutes=minutes,
+                   slots=[{'start': start.isoformat(timespec='minutes'), 'end': end.isoformat(timespec='minutes'),
+                           'minutes': int((end - start).total_seconds() // 60)} for start, end in slots])
+
+def schedule_response(theatre, dashboard):
+    """Run a bulk scheduling request; JSON for API clients, flash messages for the dashboard form"""
+    wants_json = request.is_json or request.accept_mimetypes.best == 'application/json'
+    payload = request.get_json(silent=True) if request.is_json else None
+    skip_conflicts = (payload if isinstance(payload, dict) else request.form).get('skip_conflicts') in (True, '1', 'true', 'on')
+    try:
+        created, report = schedule_showtimes(theatre, parse_schedule_request(), skip_conflicts)
+    except ValueError as e:
+        if wants_json:
+            return jsonify(ok=False, error=str(e)), 400
+        flash(str(e))
+        return redirect(url_for(dashboard, _anchor='showtimes'))
+    if created:
+        invalidate_catalogue()
+    failed = [entry for entry in report if entry['status'] in ('invalid', 'conflict')]
+    if wants_json:
+        return jsonify(ok=bool(created) or not failed, created=created, rows=report), 409 if failed and not created else 200
+    if failed and not created:
+        flash(f'Nothing was scheduled: {len(failed)} of {len(report)} showtime(s) have problems.')
+    else:
+        flash(f'{created} showtime(s) scheduled.' + (f' {len(failed)} skipped.' if failed else ''))
+    for entry in failed[:10]:
+        flash(f"Row {entry['row']}: {entry['error']}")
+    return redirect(url_for(dashboard, _anchor='showtimes'))
+
+@app.route('/theatre/bookings/export.<any(csv, ndjson):fmt>')
+@theatre_required
+def theatre_export_bookings(fmt):
+    return booking_export_response(fmt, g.theatre.id)
+
 @app.route('/theatre/edit_movie/<int:movie_id>', methods=['POST'])
 @theatre_required
 def theatre_edit_movie(movie_id):
@@ -319,7 +2461,14 @@ def theatre_edit_movie(movie_id):
     movie.genre = request.form['genre']
     movie.rating = float(request.form['rating'])
     movie.poster_url = request.form['poster_url']
+    movie.runtime = parse_runtime(request.form.get('runtime'))
+    conflict = runtime_conflict_message(movie)
+    if conflict:
+        db.session.rollback()
+        flash(conflict)
+        return redirect(url_for('theatre_dashboard'))
     db.session.commit()
+    invalidate_catalogue()
     flash('Movie updated successfully!')
     return redirect(url_for('theatre_dashboard'))
 
@@ -329,14 +2478,9 @@ def theatre_delete_movie(movie_id):
     movie = Movie.query.get_or_404(movie_id)
     # Delete all showtimes for this movie at this theatre
     theatre_id = session.get('theatre_logged_in')
-    showtimes = Showtime.query.filter_by(movie_id=movie_id, theatre_id=theatre_id).all()
-    for showtime in showtimes:
-        # Delete bookings for each showtime
-        bookings = Booking.query.filter_by(showtime_id=showtime.id).all()
-        for booking in bookings:
-            db.session.delete(booking)
-        db.session.delete(showtime)
+    delete_showtimes(Showtime.movie_id == movie.id, Showtime.theatre_id == theatre_id)
     db.session.commit()
+    invalidate_catalogue()
     flash('Movie and associated showtimes deleted successfully!')
     return redirect(url_for('theatre_dashboard'))
 
@@ -354,7 +2498,13 @@ def theatre_edit_showtime(showtime_id):
     showtime.show_time = request.form['show_time']
     showtime.screen = request.form['screen']
     showtime.total_seats = int(request.form['total_seats'])
+    conflict = total_seats_message(showtime) or screen_conflict_message(showtime)
+    if conflict:
+        db.session.rollback()
+        flash(conflict)
+        return redirect(url_for('theatre_dashboard'))
     db.session.commit()
+    invalidate_catalogue()
     flash('Showtime updated successfully!')
     return redirect(url_for('theatre_dashboard'))
 
@@ -367,13 +2517,10 @@ def theatre_delete_showtime(showtime_id):
         flash('Unauthorized access!')
         return redirect(url_for('theatre_dashboard'))
     
-    # Delete associated bookings first
-    bookings = Booking.query.filter_by(showtime_id=showtime_id).all()
-    for booking in bookings:
-        db.session.delete(booking)
-    
-    db.session.delete(showtime)
+    # Delete the showtime along with its bookings
+    delete_showtimes(Showtime.id == showtime.id)
     db.session.commit()
+    invalidate_catalogue()
     flash('Showtime deleted successfully!')
     return redirect(url_for('theatre_dashboard'))
 
@@ -383,10 +2530,16 @@ def admin_login():
     if request.method == 'POST':
         username = request.form['username']
         password = request.form['password']
+        wait = login_retry_after(f'admin:{username.lower()}')
+        if wait:
+            flash(f'Too many sign-in attempts. Please try again in {wait} seconds.')
+            return render_template('admin_login.html'), 429
         if username == 'admin' and password == 'admin123':
+            account_login_limiter.reset(f'admin:{username.lower()}')
             session['admin_logged_in'] = True
             flash('Admin login successful!')
             return redirect(url_for('admin_dashboard'))
+        account_login_limiter.hit(f'admin:{username.lower()}')
         flash('Invalid admin credentials')
     return render_template('admin_login.html')
 
@@ -409,22 +2562,92 @@ def admin_required(f):
 @admin_required
 def admin_dashboard():
     movies = Movie.query.all()
-    users = User.query.all()
-    theatres = Theatre.query.all()
-    bookings = Booking.query.all()
-    total_users = len(users)
-    total_theatres = len(theatres)
-    total_bookings = len(bookings)
-    total_revenue = len(bookings) * 200  # Assuming Rs. 200 per ticket
+    users, next_users = paginate_by_id(User.query, User, after=request.args.get('users_after', type=int))
+    theatres, next_theatres = paginate_by_id(Theatre.query, Theatre, after=request.args.get('theatres_after', type=int))
+    bookings, next_cursor = paginate_bookings(Booking.query, before=request.args.get('before', type=int))
+    total_users = db.session.scalar(db.select(func.count(User.id)))
+    total_theatres = db.session.scalar(db.select(func.count(Theatre.id)))
+    total_bookings, _, total_revenue = sales_totals()
+    user_bookings = dict(db.session.query(UserBookingSummary.user_id, UserBookingSummary.bookings)
+                         .filter(UserBookingSummary.user_id.in_([user.id for user in users])).all())
+    today = datetime.now().date()
+    trend = rollup_series(TheatreDailyRollup, today - timedelta(days=13), today + timedelta(days=8))
     return render_template('admin_dashboard.html', 
                          movies=movies, 
                          users=users,
+                         next_users=next_users,
                          theatres=theatres,
+                         next_theatres=next_theatres,
                          bookings=bookings,
+                         next_cursor=next_cursor,
+                         user_bookings=user_bookings,
                          total_theatres=total_theatres, 
                          total_users=total_users,
                          total_bookings=total_bookings,
-                         total_revenue=total_revenue)
+                         total_revenue=total_revenue,
+                         trend=trend)
+
+@app.route('/admin/bookings/export.<any(csv, ndjson):fmt>')
+@admin_required
+def admin_export_bookings(fmt):
+    """All bookings, or one theatre's with ?theatre_id="""
+    return booking_export_response(fmt, request.args.get('theatre_id', type=int))
+
+@app.route('/admin/cache_stats')
+@admin_required
+def admin_cache_stats():
+    return jsonify(catalogue_cache.stats())
+
+def cache_stats():
+    return {'catalogue': catalogue_cache.stats(), 'identity': identity_cache.stats()}
+
+@app.route('/admin/metrics')
+@admin_required
+def admin_metrics():
+    if request.args.get('format') == 'json':
+        return jsonify(dict(metrics.summary(), caches=cache_stats()))
+    return render_template('admin_metrics.html', summary=metrics.summary(), caches=cache_stats(),
+                           uptime=time.time() - metrics.started_at, sample_rate=app.config['METRICS_SAMPLE_RATE'])
+
+@app.route('/admin/metrics/prometheus')
+def admin_metrics_prometheus():
+    token = app.config['METRICS_TOKEN']
+    if not session.get('admin_logged_in') and not (token and request.headers.get('Authorization') == f'Bearer {token}'):
+        abort(403)
+    extra = []
+    for name, stats in cache_stats().items():
+        extra += [(f'cinebook_cache_{name}_hits_total', 'counter', f'Hits in the {name} cache.', stats['hits']),
+                  (f'cinebook_cache_{name}_misses_total', 'counter', f'Misses in the {name} cache.', stats['misses']),
+                  (f'cinebook_cache_{name}_entries', 'gauge', f'Entries in the {name} cache.', stats['entries'])]
+    return Response(metrics.prometheus(extra), mimetype='text/plain; version=0.0.4')
+
+@app.route('/admin/metrics/reset', methods=['POST'])
+@admin_required
+def admin_metrics_reset():
+    metrics.reset()
+    flash('Metrics reset.')
+    return redirect(url_for('admin_metrics'))
+
+@app.route('/api/analytics/daily')
+@admin_required
+def analytics_daily():
+    """Occupancy and revenue per show day across all theatres (?start=&end=, YYYY-MM-DD)"""
+    start, end = _rollup_range()
+    return jsonify(rollup_series(TheatreDailyRollup, start, end))
+
+@app.route('/api/analytics/movies/<int:movie_id>')
+@admin_required
+def analytics_movie(movie_id):
+    start, end = _rollup_range()
+    return jsonify(rollup_series(MovieDailyRollup, start, end, movie_id=movie_id))
+
+@app.route('/api/analytics/theatres/<int:theatre_id>')
+def analytics_theatre(theatre_id):
+    # Admins see every theatre, a theatre only itself
+    if not session.get('admin_logged_in') and session.get('theatre_logged_in') != theatre_id:
+        abort(403)
+    start, end = _rollup_range()
+    return jsonify(rollup_series(TheatreDailyRollup, start, end, theatre_id=theatre_id))
 
 @app.route('/admin/add_movie', methods=['POST'])
 @admin_required
@@ -442,9 +2665,11 @@ def admin_add_movie():
         poster_url = 'https://m.media-amazon.com/images/S/pv-target-images/e9a43e647b2ca70e75a3c0af046c4dfdcd712380889779cbdc2c57d94ab63902.jpg'
     elif title.strip().lower() == 'pulp fiction':
         poster_url = 'https://image.tmdb.org/t/p/original/n29q4PmwmrxKBPX2grAvFXyYXYV.jpg'
-    new_movie = Movie(title=title, director=director, release_year=release_year, genre=genre, rating=rating, poster_url=poster_url)
+    runtime = parse_runtime(request.form.get('runtime'))
+    new_movie = Movie(title=title, director=director, release_year=release_year, genre=genre, rating=rating, poster_url=poster_url, runtime=runtime)
     db.session.add(new_movie)
     db.session.commit()
+    invalidate_catalogue()
     flash('Movie added successfully!')
     return redirect(url_for('admin_dashboard'))
 
@@ -457,6 +2682,7 @@ def admin_edit_movie(movie_id):
     movie.release_year = request.form['release_year']
     movie.genre = request.form['genre']
     movie.rating = request.form['rating']
+    movie.runtime = parse_runtime(request.form.get('runtime'))
     poster_url = request.form['poster_url']
     # Force correct poster for specific movies
     if movie.title.strip().lower() == 'inception':
@@ -467,7 +2693,13 @@ def admin_edit_movie(movie_id):
         movie.poster_url = 'https://image.tmdb.org/t/p/original/n29q4PmwmrxKBPX2grAvFXyYXYV.jpg'
     else:
         movie.poster_url = poster_url
+    conflict = runtime_conflict_message(movie)
+    if conflict:
+        db.session.rollback()
+        flash(conflict)
+        return redirect(url_for('admin_dashboard'))
     db.session.commit()
+    invalidate_catalogue()
     flash('Movie updated successfully!')
     return redirect(url_for('admin_dashboard'))
 
@@ -476,19 +2708,14 @@ def admin_edit_movie(movie_id):
 def admin_delete_movie(movie_id):
     movie = Movie.query.get_or_404(movie_id)
     
-    # First delete all associated showtimes
-    showtimes = Showtime.query.filter_by(movie_id=movie_id).all()
-    for showtime in showtimes:
-        # Delete all bookings for this showtime
-        bookings = Booking.query.filter_by(showtime_id=showtime.id).all()
-        for booking in bookings:
-            db.session.delete(booking)
-        # Delete the showtime
-        db.session.delete(showtime)
+    # First delete all associated showtimes and their bookings
+    delete_showtimes(Showtime.movie_id == movie.id)
+    db.session.execute(db.delete(MovieDailyRollup).where(MovieDailyRollup.movie_id == movie.id))
     
     # Now delete the movie
     db.session.delete(movie)
     db.session.commit()
+    invalidate_catalogue()
     flash('Movie and all associated data deleted successfully!')
     return redirect(url_for('admin_dashboard'))
 
@@ -501,13 +2728,27 @@ def admin_manage_showtimes(movie_id):
         show_time = request.form['show_time']
         screen = request.form['screen']
         total_seats = request.form['total_seats']
-        new_showtime = Showtime(movie_id=movie.id, show_date=show_date, show_time=show_time, screen=screen, total_seats=total_seats, booked_seats='')
+        theatre = Theatre.query.get_or_404(int(request.form['theatre_id']))
+        new_showtime = Showtime(movie_id=movie.id, theatre_id=theatre.id, show_date=show_date, show_time=show_time,
+                                screen=screen, total_seats=total_seats)
+        conflict = total_seats_message(new_showtime) or screen_conflict_message(new_showtime)
+        if conflict:
+            flash(conflict)
+            return redirect(url_for('admin_manage_showtimes', movie_id=movie.id))
         db.session.add(new_showtime)
         db.session.commit()
+        invalidate_catalogue()
         flash('Showtime added!')
         return redirect(url_for('admin_manage_showtimes', movie_id=movie.id))
-    showtimes = Showtime.query.filter_by(movie_id=movie.id).all()
-    return render_template('admin_showtimes.html', movie=movie, showtimes=showtimes)
+    showtimes = Showtime.query.filter_by(movie_id=movie.id).options(joinedload(Showtime.theatre)).all()
+    theatres = Theatre.query.order_by(Theatre.name).all()
+    return render_template('admin_showtimes.html', movie=movie, showtimes=showtimes, theatres=theatres)
+
+@app.route('/admin/theatres/<int:theatre_id>/schedule', methods=['POST'])
+@admin_required
+def admin_schedule(theatre_id):
+    """Bulk scheduling on behalf of a theatre"""
+    return schedule_response(Theatre.query.get_or_404(theatre_id), 'admin_dashboard')
 
 @app.route('/admin/edit_showtime/<int:showtime_id>', methods=['POST'])
 @admin_required
@@ -517,7 +2758,13 @@ def admin_edit_showtime(showtime_id):
     showtime.show_time = request.form['show_time']
     showtime.screen = request.form['screen']
     showtime.total_seats = request.form['total_seats']
+    conflict = total_seats_message(showtime) or screen_conflict_message(showtime)
+    if conflict:
+        db.session.rollback()
+        flash(conflict)
+        return redirect(url_for('admin_manage_showtimes', movie_id=showtime.movie_id))
     db.session.commit()
+    invalidate_catalogue()
     flash('Showtime updated!')
     return redirect(url_for('admin_manage_showtimes', movie_id=showtime.movie_id))
 
@@ -526,8 +2773,9 @@ def admin_edit_showtime(showtime_id):
 def admin_delete_showtime(showtime_id):
     showtime = Showtime.query.get_or_404(showtime_id)
     movie_id = showtime.movie_id
-    db.session.delete(showtime)
+    delete_showtimes(Showtime.id == showtime.id)
     db.session.commit()
+    invalidate_catalogue()
     flash('Showtime deleted!')
     return redirect(url_for('admin_manage_showtimes', movie_id=movie_id))
 
@@ -542,7 +2790,7 @@ def admin_add_theatre():
     phone = request.form['phone']
     total_screens = int(request.form['total_screens'])
     
-    hashed_password = generate_password_hash(password)
+    hashed_password = password_hasher.hash(password)
     theatre = Theatre(name=name, location=location, owner_name=owner_name,
                      email=email, password=hashed_password, phone=phone,
                      total_screens=total_screens)
@@ -557,159 +2805,329 @@ def admin_delete_theatre(theatre_id):
     theatre = Theatre.query.get_or_404(theatre_id)
     
     # Delete all associated showtimes and bookings
-    showtimes = Showtime.query.filter_by(theatre_id=theatre_id).all()
-    for showtime in showtimes:
-        bookings = Booking.query.filter_by(showtime_id=showtime.id).all()
-        for booking in bookings:
-            db.session.delete(booking)
-        db.session.delete(showtime)
+    delete_showtimes(Showtime.theatre_id == theatre.id)
+    db.session.execute(db.delete(TheatreDailyRollup).where(TheatreDailyRollup.theatre_id == theatre.id))
     
     db.session.delete(theatre)
     db.session.commit()
+    invalidate_catalogue()
     flash('Theatre and all associated data deleted successfully!')
     return redirect(url_for('admin_dashboard'))
 
 @app.route('/create_test_user')
 def create_test_user():
-    from werkzeug.security import generate_password_hash
     if not User.query.filter_by(email='test@gmail.com').first():
-        u = User(email='test@gmail.com', username='test', password=generate_password_hash('test123'))
+        u = User(email='test@gmail.com', username='test', password=password_hasher.hash('test123'))
         db.session.add(u)
         db.session.commit()
         return 'Test user created! Email: test@gmail.com, Password: test123'
     return 'Test user already exists.'
 
+# --- Schema migrations ---
+# Each migration runs once per database and is recorded in the schema_version table.
+# db.create_all() already builds new databases at the latest schema, so migrations
+# must be no-ops when their change is already present.
+MIGRATIONS = []
+
+def migration(version, description):
+    def decorator(f):
+        MIGRATIONS.append((version, description, f))
+        return f
+    return decorator
+
+def _column_exists(conn, table, column):
+    return any(row[1] == column for row in conn.execute(db.text(f'PRAGMA table_info({table})')))
+
+@migration(1, 'Add email column to user table')
+def _migrate_user_email(conn):
+    if not _column_exists(conn, 'user', 'email'):
+        conn.execute(db.text('ALTER TABLE user ADD COLUMN email VARCHAR(150)'))
+
+@migration(2, 'Add theatre_id column to showtime table')
+def _migrate_showtime_theatre(conn):
+    if not _column_exists(conn, 'showtime', 'theatre_id'):
+        conn.execute(db.text('ALTER TABLE showtime ADD COLUMN theatre_id INTEGER'))
+
+@migration(3, 'Give existing users Gmail addresses')
+def _migrate_user_gmail(conn):
+    users = conn.execute(db.text('SELECT id, username FROM user WHERE email IS NULL OR email = ""')).fetchall()
+    for user_id, username in users:
+        conn.execute(db.text('UPDATE user SET email = :email WHERE id = :user_id'),
+                     {'email': f"{username}@gmail.com", 'user_id': user_id})
+
+@migration(4, 'Assign existing showtimes to the default theatre')
+def _migrate_showtime_default_theatre(conn):
+    theatre = conn.execute(db.text('SELECT id FROM theatre LIMIT 1')).fetchone()
+    if theatre:
+        conn.execute(db.text('UPDATE showtime SET theatre_id = :theatre_id WHERE theatre_id IS NULL'),
+                     {'theatre_id': theatre[0]})
+
+@migration(5, 'Backfill per-seat rows for existing bookings')
+def _migrate_booking_seats(conn):
+    bookings = conn.execute(db.text('SELECT id, showtime_id, seats FROM booking '
+                                    'WHERE id NOT IN (SELECT booking_id FROM booking_seat)')).fetchall()
+    for booking_id, showtime_id, seats in bookings:
+        for seat in (seats or '').split(','):
+            if seat.strip().isdigit():
+                # OR IGNORE: legacy data may already contain double-booked seats
+                conn.execute(db.text('INSERT OR IGNORE INTO booking_seat (booking_id, showtime_id, seat_number) '
+                                     'VALUES (:booking_id, :showtime_id, :seat)'),
+                             {'booking_id': booking_id, 'showtime_id': showtime_id, 'seat': int(seat)})
+
+@migration(6, 'Replace showtime.booked_seats with the seat_map bitmap')
+def _migrate_seat_map(conn):
+    if not _column_exists(conn, 'showtime', 'seat_map'):
+        conn.execute(db.text("ALTER TABLE showtime ADD COLUMN seat_map BLOB NOT NULL DEFAULT x''"))
+    if _column_exists(conn, 'showtime', 'booked_seats'):
+        for showtime_id, total_seats in conn.execute(db.text('SELECT id, total_seats FROM showtime')).fetchall():
+            seat_map = SeatMap(total_seats)
+            for seat, in conn.execute(db.text('SELECT seat_number FROM booking_seat WHERE showtime_id = :id'),
+                                      {'id': showtime_id}):
+                try:
+                    seat_map.add(seat)
+                except ValueError:
+                    # Legacy bookings could name seats the screen doesn't have; leave them out of the map
+                    print(f"  Skipped seat {seat} of showtime {showtime_id}: outside 1-{total_seats}")
+            conn.execute(db.text('UPDATE showtime SET seat_map = :seat_map WHERE id = :id'),
+                         {'seat_map': seat_map.to_bytes(), 'id': showtime_id})
+        conn.execute(db.text('ALTER TABLE showtime DROP COLUMN booked_seats'))
+
+@migration(7, 'Add seat_count column to booking table')
+def _migrate_booking_seat_count(conn):
+    if not _column_exists(conn, 'booking', 'seat_count'):
+        conn.execute(db.text('ALTER TABLE booking ADD COLUMN seat_count INTEGER NOT NULL DEFAULT 0'))
+        conn.execute(db.text('UPDATE booking SET seat_count = '
+                             '(SELECT COUNT(*) FROM booking_seat WHERE booking_seat.booking_id = booking.id)'))
+
+@migration(8, 'Add indexes for showtime and booking lookups')
+def _migrate_lookup_indexes(conn):
+    conn.execute(db.text('CREATE INDEX IF NOT EXISTS ix_showtime_movie_id ON showtime (movie_id)'))
+    conn.execute(db.text('CREATE INDEX IF NOT EXISTS ix_showtime_theatre_id ON showtime (theatre_id)'))
+    conn.execute(db.text('CREATE INDEX IF NOT EXISTS ix_booking_showtime_id ON booking (showtime_id)'))
+    conn.execute(db.text('CREATE INDEX IF NOT EXISTS ix_booking_booking_time ON booking (booking_time)'))
+    conn.execute(db.text('CREATE INDEX IF NOT EXISTS ix_booking_user_id_booking_time ON booking (user_id, booking_time)'))
+    conn.execute(db.text('CREATE INDEX IF NOT EXISTS ix_booking_seat_booking_id ON booking_seat (booking_id)'))
+
+@migration(9, 'Add typed starts_at column to showtime table')
+def _migrate_showtime_starts_at(conn):
+    if not _column_exists(conn, 'showtime', 'starts_at'):
+        conn.execute(db.text('ALTER TABLE showtime ADD COLUMN starts_at DATETIME'))
+    rows = conn.execute(db.text('SELECT id, show_date, show_time FROM showtime WHERE starts_at IS NULL')).fetchall()
+    for showtime_id, show_date, show_time in rows:
+        # Through the table (not raw SQL) so the value is stored in SQLAlchemy's DateTime format
+        conn.execute(Showtime.__table__.update().where(Showtime.__table__.c.id == showtime_id)
+                     .values(starts_at=parse_show_datetime(show_date, show_time)))
+    conn.execute(db.text('CREATE INDEX IF NOT EXISTS ix_showtime_starts_at ON showtime (starts_at)'))
+
+@migration(10, 'Add full-text search index for movies')
+def _migrate_movie_fts(conn):
+    global _fts_enabled
+    _fts_enabled = None  # re-check once the table exists
+    try:
+        conn.execute(db.text("CREATE VIRTUAL TABLE IF NOT EXISTS movie_fts USING fts5("
+                             "title, director, genre, prefix='2 3', tokenize='unicode61 remove_diacritics 2')"))
+    except Exception as e:
+        print(f"Note: full-text search unavailable, falling back to LIKE ({e})")
+        return
+    conn.execute(db.text('DELETE FROM movie_fts'))
+    conn.execute(db.text('INSERT INTO movie_fts (rowid, title, director, genre) SELECT id, title, director, genre FROM movie'))
+
+@migration(11, 'Add per-user booking summaries')
+def _migrate_user_booking_summary(conn):
+    conn.execute(db.text('CREATE TABLE IF NOT EXISTS user_booking_summary ('
+                         'user_id INTEGER NOT NULL PRIMARY KEY REFERENCES user (id), '
+                         'bookings INTEGER NOT NULL DEFAULT 0, seats INTEGER NOT NULL DEFAULT 0, '
+                         'spend INTEGER NOT NULL DEFAULT 0, last_booking_at DATETIME)'))
+    rebuild_booking_summaries(connection=conn)
+
+@migration(12, 'Add occupancy and revenue rollups')
+def _migrate_rollups(conn):
+    conn.execute(db.text('CREATE TABLE IF NOT EXISTS showtime_rollup ('
+                         'showtime_id INTEGER NOT NULL PRIMARY KEY REFERENCES showtime (id), '
+                         'bookings INTEGER NOT NULL DEFAULT 0, seats_sold INTEGER NOT NULL DEFAULT 0, '
+                         'revenue INTEGER NOT NULL DEFAULT 0)'))
+    for table, key in (('movie_daily_rollup', 'movie'), ('theatre_daily_rollup', 'theatre')):
+        conn.execute(db.text(f'CREATE TABLE IF NOT EXISTS {table} ('
+                             f'{key}_id INTEGER NOT NULL REFERENCES {key} (id), day DATE NOT NULL, '
+                             'showtimes INTEGER NOT NULL DEFAULT 0, capacity INTEGER NOT NULL DEFAULT 0, '
+                             'bookings INTEGER NOT NULL DEFAULT 0, seats_sold INTEGER NOT NULL DEFAULT 0, '
+                             f'revenue INTEGER NOT NULL DEFAULT 0, PRIMARY KEY ({key}_id, day))'))
+    rebuild_rollups(connection=conn)
+
+@migration(13, 'Add seat holds')
+def _migrate_seat_holds(conn):
+    conn.execute(db.text('CREATE TABLE IF NOT EXISTS seat_hold ('
+                         'id INTEGER NOT NULL PRIMARY KEY, showtime_id INTEGER NOT NULL REFERENCES showtime (id), '
+                         'seat_number INTEGER NOT NULL, user_id INTEGER NOT NULL REFERENCES user (id), '
+                         'expires_at DATETIME NOT NULL, '
+                         'CONSTRAINT uq_seat_hold UNIQUE (showtime_id, seat_number))'))
+    conn.execute(db.text('CREATE INDEX IF NOT EXISTS ix_seat_hold_user_id ON seat_hold (user_id)'))
+    conn.execute(db.text('CREATE INDEX IF NOT EXISTS ix_seat_hold_expires_at ON seat_hold (expires_at)'))
+
+@migration(14, 'Add movie runtimes and showtime end times for screen overlap checks')
+def _migrate_showtime_ends_at(conn):
+    if not _column_exists(conn, 'movie', 'runtime'):
+        conn.execute(db.text('ALTER TABLE movie ADD COLUMN runtime INTEGER'))
+    if not _column_exists(conn, 'showtime', 'ends_at'):
+        conn.execute(db.text('ALTER TABLE showtime ADD COLUMN ends_at DATETIME'))
+    table = Showtime.__table__
+    rows = conn.execute(db.select(table.c.id, table.c.starts_at, Movie.__table__.c.runtime)
+                        .join(Movie.__table__, Movie.__table__.c.id == table.c.movie_id)
+                        .where(table.c.ends_at.is_(None))).fetchall()
+    if rows:
+        conn.execute(table.update().where(table.c.id == db.bindparam('b_id')).values(ends_at=db.bindparam('b_ends_at')),
+                     [{'b_id': showtime_id, 'b_ends_at': showtime_end(starts_at, runtime)} for showtime_id, starts_at, runtime in rows])
+    conn.execute(db.text('CREATE INDEX IF NOT EXISTS ix_showtime_screen_starts_at ON showtime (theatre_id, screen, starts_at)'))
+
+@migration(15, 'Add catalogue version counters for conditional GETs')
+def _migrate_catalogue_version(conn):
+    conn.execute(db.text('CREATE TABLE IF NOT EXISTS catalogue_version ('
+                         'key VARCHAR(50) NOT NULL PRIMARY KEY, version INTEGER NOT NULL DEFAULT 0, '
+                         'updated_at DATETIME NOT NULL)'))
+
+@migration(16, 'Add per-user booking month lists')
+def _migrate_user_booking_month(conn):
+    conn.execute(db.text('CREATE TABLE IF NOT EXISTS user_booking_month ('
+                         'user_id INTEGER NOT NULL REFERENCES user (id), month DATE NOT NULL, '
+                         'bookings INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (user_id, month))'))
+    rebuild_booking_summaries(connection=conn)
+
+@migration(17, 'Give archived bookings their own ids')
+def _migrate_booking_archive_ids(conn):
+    if _column_exists(conn, 'booking_archive', 'booking_id'):
+        return
+    # SQLite can't change a primary key in place, so copy into a new table
+    conn.execute(db.text('CREATE TABLE booking_archive_new ('
+                         'id INTEGER NOT NULL PRIMARY KEY, booking_id INTEGER NOT NULL, user_id INTEGER NOT NULL, '
+                         'showtime_id INTEGER NOT NULL, seats VARCHAR(100) NOT NULL, seat_count INTEGER NOT NULL, '
+                         'booking_time DATETIME NOT NULL, archived_at DATETIME NOT NULL)'))
+    conn.execute(db.text('INSERT INTO booking_archive_new (booking_id, user_id, showtime_id, seats, seat_count, '
+                         'booking_time, archived_at) SELECT id, user_id, showtime_id, seats, seat_count, booking_time, '
+                         'archived_at FROM booking_archive ORDER BY archived_at, id'))
+    conn.execute(db.text('DROP TABLE booking_archive'))
+    conn.execute(db.text('ALTER TABLE booking_archive_new RENAME TO booking_archive'))
+    conn.execute(db.text('CREATE INDEX ix_booking_archive_user_id ON booking_archive (user_id)'))
+    conn.execute(db.text('CREATE INDEX ix_booking_archive_booking_id ON booking_archive (booking_id)'))
+
 def migrate_database():
-    """Migrate existing database to new schema without deleting data"""
+    """Apply any pending schema migrations, in version order, without deleting data"""
     with app.app_context():
-        try:
-            # Add email column if it doesn't exist
-            with db.engine.connect() as conn:
-                conn.execute(db.text('ALTER TABLE user ADD COLUMN email VARCHAR(150)'))
-                conn.commit()
-            print("✓ Added email column to user table")
-        except Exception as e:
-            if "duplicate column name" in str(e).lower():
-                print("✓ Email column already exists")
-            else:
-                print(f"Note: {e}")
-        
-        try:
-            # Add theatre_id column to showtime table if it doesn't exist
-            with db.engine.connect() as conn:
-                conn.execute(db.text('ALTER TABLE showtime ADD COLUMN theatre_id INTEGER'))
-                conn.commit()
-            print("✓ Added theatre_id column to showtime table")
-        except Exception as e:
-            if "duplicate column name" in str(e).lower():
-                print("✓ Theatre_id column already exists")
-            else:
-                print(f"Note: {e}")
-        
-        try:
-            # Update existing users to have Gmail addresses
-            with db.engine.connect() as conn:
-                result = conn.execute(db.text('SELECT id, username FROM user WHERE email IS NULL OR email = ""'))
-                users = result.fetchall()
-                
-                for user_id, username in users:
-                    email = f"{username}@gmail.com"
-                    conn.execute(db.text('UPDATE user SET email = :email WHERE id = :user_id'), 
-                               {'email': email, 'user_id': user_id})
-                conn.commit()
-                
-            if users:
-                print(f"✓ Migrated {len(users)} existing users to Gmail format")
-        except Exception as e:
-            print(f"Migration note: {e}")
-        
-        try:
-            # Update existing showtimes to have theatre_id (set to 1 for default theatre)
-            with db.engine.connect() as conn:
-                result = conn.execute(db.text('SELECT id FROM showtime WHERE theatre_id IS NULL'))
-                showtimes = result.fetchall()
-                
-                if showtimes:
-                    # Ensure default theatre exists
-                    theatre_result = conn.execute(db.text('SELECT id FROM theatre LIMIT 1'))
-                    theatre = theatre_result.fetchone()
-                    
-                    if theatre:
-                        theatre_id = theatre[0]
-                        for showtime_id, in showtimes:
-                            conn.execute(db.text('UPDATE showtime SET theatre_id = :theatre_id WHERE id = :showtime_id'), 
-                                       {'theatre_id': theatre_id, 'showtime_id': showtime_id})
-                        conn.commit()
-                        print(f"✓ Updated {len(showtimes)} existing showtimes with theatre_id")
-        except Exception as e:
-            print(f"Showtime migration note: {e}")
+        with db.engine.begin() as conn:
+            conn.execute(db.text('CREATE TABLE IF NOT EXISTS schema_version ('
+                                 'version INTEGER PRIMARY KEY, description VARCHAR(200) NOT NULL, '
+                                 'applied_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP)'))
+            applied = {row[0] for row in conn.execute(db.text('SELECT version FROM schema_version'))}
+        for version, description, upgrade in sorted(MIGRATIONS, key=lambda m: m[0]):
+            if version in applied:
+                continue
+            with db.engine.begin() as conn:
+                upgrade(conn)
+                conn.execute(db.text('INSERT INTO schema_version (version, description) VALUES (:version, :description)'),
+                             {'version': version, 'description': description})
+            print(f"✓ Migration {version}: {description}")
 
-if __name__ == '__main__':
-    from datetime import datetime, timedelta
-    
+def latest_schema_version():
+    return max(version for version, _, _ in MIGRATIONS)
+
+def schema_version(conn):
+    """Highest migration recorded in the database, 0 if it has never been migrated"""
+    if not db.inspect(conn).has_table('schema_version'):
+        return 0
+    return conn.execute(db.text('SELECT MAX(version) FROM schema_version')).scalar() or 0
+
+def init_database():
+    """Create missing tables and apply pending migrations; returns False if the schema was already current"""
     with app.app_context():
-        # Create all tables
+        with db.engine.connect() as conn:
+            if schema_version(conn) >= latest_schema_version():
+                return False
         db.create_all()
-        
-        # Run migration
         migrate_database()
-        
-        # Create test user with Gmail if not exists
-        try:
-            if not User.query.filter_by(email='test@gmail.com').first():
-                test_user = User(
-                    email='test@gmail.com',
-                    username='test',
-                    password=generate_password_hash('test123')
-                )
-                db.session.add(test_user)
-                db.session.commit()
-                print("✓ Test user created: test@gmail.com / test123")
-        except:
-            print("✓ Test user already exists")
-        
-        # Add sample movies if database is empty
-        if not Movie.query.first():
-            sample_movies = [
-                Movie(title='Inception', director='Christopher Nolan', release_year=2010, genre='Sci-Fi', rating=8.8, poster_url='https://flxt.tmsimg.com/assets/p7825626_p_v8_af.jpg'),
-                Movie(title='The Dark Knight', director='Christopher Nolan', release_year=2008, genre='Action', rating=9.0, poster_url='https://m.media-amazon.com/images/S/pv-target-images/e9a43e647b2ca70e75a3c0af046c4dfdcd712380889779cbdc2c57d94ab63902.jpg'),
-                Movie(title='Pulp Fiction', director='Quentin Tarantino', release_year=1994, genre='Crime', rating=8.9, poster_url='https://image.tmdb.org/t/p/original/n29q4PmwmrxKBPX2grAvFXyYXYV.jpg')
-            ]
-            db.session.bulk_save_objects(sample_movies)
-            db.session.commit()
-            print("✓ Sample movies added")
-        
-        # Create default theatre if none exists
-        if not Theatre.query.first():
-            default_theatre = Theatre(
-                name='CineMax Theatre',
-                location='Downtown Plaza, Main Street',
-                owner_name='Admin Theatre',
-                email='theatre@cinemax.com',
-                password=generate_password_hash('theatre123'),
-                phone='+91-9876543210',
-                total_screens=3
-            )
-            db.session.add(default_theatre)
-            db.session.commit()
-            print("✓ Default theatre created")
-        
-        # Add sample showtimes with theatre_id
-        default_theatre = Theatre.query.first()
-        for movie in Movie.query.all():
-            if not Showtime.query.filter_by(movie_id=movie.id).first():
-                for i in range(3):
-                    show_date = (datetime.now() + timedelta(days=i)).strftime('%Y-%m-%d')
-                    show_time = f"{18+i}:00"
-                    screen = f"Screen {i+1}"
-                    showtime = Showtime(movie_id=movie.id, theatre_id=default_theatre.id, 
-                                      show_date=show_date, show_time=show_time, 
-                                      screen=screen, total_seats=40, booked_seats='')
-                    db.session.add(showtime)
+        return True
+
+def seed_demo_data():
+    """Add the test user, sample movies, a default theatre and sample showtimes where missing"""
+    if not User.query.filter_by(email='test@gmail.com').first():
+        db.session.add(User(email='test@gmail.com', username='test', password=password_hasher.hash('test123')))
         db.session.commit()
-        
-        print("🎬 CineBook is ready!")
-        print("📧 Gmail authentication enabled")
-        print("🗄️  Database viewable in DB Browser for SQLite at: instance/database.db")
-    
-    app.run(debug=True)
+        print("✓ Test user created: test@gmail.com / test123")
+
+    if not Movie.query.first():
+        sample_movies = [
+            Movie(title='Inception', director='Christopher Nolan', release_year=2010, genre='Sci-Fi', rating=8.8, runtime=148, poster_url='https://flxt.tmsimg.com/assets/p7825626_p_v8_af.jpg'),
+            Movie(title='The Dark Knight', director='Christopher Nolan', release_year=2008, genre='Action', rating=9.0, runtime=152, poster_url='https://m.media-amazon.com/images/S/pv-target-images/e9a43e647b2ca70e75a3c0af046c4dfdcd712380889779cbdc2c57d94ab63902.jpg'),
+            Movie(title='Pulp Fiction', director='Quentin Tarantino', release_year=1994, genre='Crime', rating=8.9, runtime=154, poster_url='https://image.tmdb.org/t/p/original/n29q4PmwmrxKBPX2grAvFXyYXYV.jpg')
+        ]
+        db.session.add_all(sample_movies)
+        db.session.commit()
+        print("✓ Sample movies added")
+
+    default_theatre = Theatre.query.first()
+    if not default_theatre:
+        default_theatre = Theatre(
+            name='CineMax Theatre',
+            location='Downtown Plaza, Main Street',
+            owner_name='Admin Theatre',
+            email='theatre@cinemax.com',
+            password=password_hasher.hash('theatre123'),
+            phone='+91-9876543210',
+            total_screens=3
+        )
+        db.session.add(default_theatre)
+        db.session.commit()
+        print("✓ Default theatre created")
+
+    # Three showtimes for each movie that has none, each day's movies on different screens
+    scheduled = set(db.session.scalars(db.select(Showtime.movie_id).distinct()))
+    for index, movie in enumerate(Movie.query.order_by(Movie.id)):
+        if movie.id in scheduled:
+            continue
+        for i in range(3):
+            db.session.add(Showtime(movie_id=movie.id, theatre_id=default_theatre.id,
+                                    show_date=(datetime.now() + timedelta(days=i)).strftime('%Y-%m-%d'),
+                                    show_time=f"{18+i}:00", screen=f"Screen {(i + index) % 3 + 1}", total_seats=40))
+    db.session.commit()
+    invalidate_catalogue()
+
+@app.cli.command('migrate')
+def migrate_command():
+    """Create missing tables and apply pending schema migrations."""
+    if not init_database():
+        print(f"✓ Schema already at version {latest_schema_version()}")
+
+@app.cli.command('seed-demo')
+def seed_demo_command():
+    """Add demo accounts, movies and showtimes (safe to run repeatedly)."""
+    seed_demo_data()
+    print("✓ Demo data ready")
+
+_schema_checked = False
+
+def create_app():
+    """Application factory for WSGI servers, e.g. gunicorn 'app:create_app()'.
+
+    Settings come from the environment when the module is imported. This only checks,
+    once per process, that the database schema is current, which is a single query when
+    nothing has changed. Pending migrations are applied if AUTO_MIGRATE is set;
+    otherwise startup fails with a pointer to `flask migrate`.
+    """
+    global _schema_checked
+    if not _schema_checked:
+        with app.app_context(), db.engine.connect() as conn:
+            current = schema_version(conn)
+        if current < latest_schema_version():
+            if not app.config['AUTO_MIGRATE']:
+                raise RuntimeError(f'Database schema is at version {current}, this code needs '
+                                   f'{latest_schema_version()}. Run `flask --app app migrate`.')
+            init_database()
+        _schema_checked = True
+    return app
+
+if __name__ == '__main__':
+    # The dev server migrates on start; seed demo data with `flask --app app seed-demo`
+    app.config['AUTO_MIGRATE'] = True
+    create_app()
+    print("🎬 CineBook is ready!")
+    print("📧 Gmail authentication enabled")
+    print("🗄️  Database viewable in DB Browser for SQLite at: instance/database.db")
+    app.run(debug=os.environ.get('FLASK_DEBUG') == '1', threaded=True)
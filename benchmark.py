@@ -0,0 +1,469 @@
+"""Benchmark and load-test the CineBook booking flows.
+
+Seeds a synthetic dataset into its own SQLite file (never the dev database), then
+drives the main pages through the Flask test client and through a real HTTP server
+with concurrent clients. For every route it reports p50/p95/p99 latency, throughput
+and SQL statements per request, and writes the numbers to a JSON baseline that a
+later run can be compared against.
+
+    python benchmark.py --bookings 2000000              # seed and run
+    python benchmark.py --reuse --output before.json    # run again on the same data
+    python benchmark.py --reuse --compare before.json   # exit 1 on regressions
+
+It also times cold starts (a fresh interpreter importing the app and calling
+create_app against the seeded, up-to-date database) and fails if the median
+is over --startup-target.
+"""
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import click
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+GENRES = ['Action', 'Comedy', 'Crime', 'Drama', 'Horror', 'Romance', 'Sci-Fi', 'Thriller']
+WORDS = ['Dark', 'Night', 'Lost', 'City', 'Storm', 'Silent', 'Last', 'Red', 'Star', 'River',
+         'Ghost', 'Iron', 'Summer', 'Shadow', 'Empire', 'Golden', 'Frozen', 'Wild', 'Secret', 'Broken']
+DIRECTORS = ['Christopher Nolan', 'Quentin Tarantino', 'Greta Gerwig', 'Denis Villeneuve', 'Bong Joon-ho',
+             'Kathryn Bigelow', 'Mani Ratnam', 'Zoya Akhtar', 'Hayao Miyazaki', 'Jordan Peele']
+SEATS_PER_SHOWTIME = 40
+CHUNK_SIZE = 10000
+
+
+# Dataset
+
+def seed_database(app_module, movies, theatres, users, showtimes_per_movie, bookings, seed):
+    """Fill a new, empty database with synthetic data using bulk inserts.
+
+    Upcoming showtimes are left about half full so there are seats to book; the
+    remaining bookings go to past showtimes that are created as needed, so the
+    booking history can be made as large as required.
+    Returns the ids and free seats the load generator needs.
+    """
+    m = app_module
+    db = m.db
+    rng = random.Random(seed)
+    now = datetime.now().replace(second=0, microsecond=0)
+    password = m.generate_password_hash('benchmark')
+
+    m.init_database()
+
+    with db.engine.begin() as conn:
+        conn.exec_driver_sql('PRAGMA synchronous=OFF')
+        conn.execute(m.User.__table__.insert(), [
+            {'id': i, 'email': f'user{i}@gmail.com', 'username': f'user{i}', 'password': password}
+            for i in range(1, users + 1)])
+        conn.execute(m.Theatre.__table__.insert(), [
+            {'id': i, 'name': f'Theatre {i}', 'location': f'{i} Main Street', 'owner_name': f'Owner {i}',
+             'email': f'theatre{i}@cinebook.test', 'password': password, 'phone': f'+91-90000{i:05d}',
+             'total_screens': 3, 'created_at': now}
+            for i in range(1, theatres + 1)])
+        conn.execute(m.Movie.__table__.insert(), [
+            {'id': i, 'title': f'{rng.choice(WORDS)} {rng.choice(WORDS)} {i}', 'director': rng.choice(DIRECTORS),
+             'release_year': rng.randint(1970, now.year), 'genre': rng.choice(GENRES),
+             'rating': round(rng.uniform(5.0, 9.5), 1), 'poster_url': f'https://example.com/posters/{i}.jpg'}
+            for i in range(1, movies + 1)])
+        if m.fts_enabled(conn):
+            conn.execute(db.text('DELETE FROM movie_fts'))
+            conn.execute(db.text('INSERT INTO movie_fts (rowid, title, director, genre) '
+                                 'SELECT id, title, director, genre FROM movie'))
+
+        showtime_rows, booking_rows, seat_rows = [], [], []
+        free_seats = {}
+        counts = {'showtimes': 0, 'bookings': 0, 'booking_seats': 0}
+
+        def flush(force=False):
+            if force or len(seat_rows) >= CHUNK_SIZE:
+                # Parents first so the rows always reference existing ids
+                for table, rows in ((m.Showtime.__table__, showtime_rows), (m.Booking.__table__, booking_rows),
+                                    (m.BookingSeat.__table__, seat_rows)):
+                    if rows:
+                        conn.execute(table.insert(), rows)
+                        rows.clear()
+
+        def add_showtime(starts_at, fill):
+            counts['showtimes'] += 1
+            showtime_id = counts['showtimes']
+            seat_map = m.SeatMap(SEATS_PER_SHOWTIME)
+            seats = list(range(1, SEATS_PER_SHOWTIME + 1))
+            rng.shuffle(seats)
+            # Leave the free seats at the end so the bookings take from the front
+            bookable = int(SEATS_PER_SHOWTIME * fill)
+            while bookable and counts['bookings'] < bookings:
+                taken = sorted(seats[:min(rng.randint(1, 4), bookable)])
+                del seats[:len(taken)]
+                bookable -= len(taken)
+                counts['bookings'] += 1
+                booking_id = counts['bookings']
+                booked_at = min(starts_at, now) - timedelta(minutes=rng.randint(1, 60 * 24 * 30))
+                booking_rows.append({'id': booking_id, 'user_id': rng.randint(1, users), 'showtime_id': showtime_id,
+                                     'seats': ','.join(str(s) for s in taken), 'seat_count': len(taken),
+                                     'booking_time': booked_at})
+                for seat in taken:
+                    seat_map.add(seat)
+                    counts['booking_seats'] += 1
+                    seat_rows.append({'booking_id': booking_id, 'showtime_id': showtime_id, 'seat_number': seat})
+            # Core inserts skip the ORM events, so starts_at and ends_at are filled in here
+            showtime_rows.append({'id': showtime_id, 'movie_id': rng.randint(1, movies),
+                                  'theatre_id': rng.randint(1, theatres), 'show_date': starts_at.strftime('%Y-%m-%d'),
+                                  'show_time': starts_at.strftime('%H:%M'), 'screen': f'Screen {rng.randint(1, 3)}',
+                                  'total_seats': SEATS_PER_SHOWTIME, 'seat_map': seat_map.to_bytes(),
+                                  'starts_at': starts_at, 'ends_at': m.showtime_end(starts_at, None)})
+            flush()
+            return showtime_id, seats
+
+        for _ in range(movies * showtimes_per_movie):
+            starts_at = (now + timedelta(days=rng.randint(1, 14))).replace(hour=rng.choice([10, 13, 16, 19, 22]), minute=0)
+            showtime_id, seats = add_showtime(starts_at, fill=0.5)
+            free_seats[showtime_id] = seats
+        # Upcoming showtimes are numbered first, so every booking below is history
+        while counts['bookings'] < bookings:
+            starts_at = (now - timedelta(days=rng.randint(1, 365))).replace(hour=rng.choice([10, 13, 16, 19, 22]), minute=0)
+            add_showtime(starts_at, fill=0.9)
+        flush(force=True)
+        m.rebuild_booking_summaries(connection=conn)
+        m.rebuild_rollups(connection=conn)
+
+    dataset = {'movies': movies, 'theatres': theatres, 'users': users, 'showtimes': counts['showtimes'],
+               'upcoming_showtimes': len(free_seats), 'bookings': counts['bookings'],
+               'booking_seats': counts['booking_seats'], 'seed': seed}
+    return dataset, free_seats
+
+
+def load_free_seats(app_module):
+    """Free seats of every upcoming showtime in an existing benchmark database"""
+    m = app_module
+    return {showtime.id: [seat for seat in range(1, showtime.total_seats + 1) if seat not in showtime.get_seat_map()]
+            for showtime in m.Showtime.upcoming()}
+
+
+# Load generation
+
+class Scenario:
+    """Builds randomised requests for the benchmarked routes from the seeded dataset"""
+
+    def __init__(self, app_module, dataset, free_seats, seed):
+        self.dataset = dataset
+        self.free_seats = free_seats
+        self.showtime_ids = sorted(free_seats)
+        self.rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._serializer = app_module.app.session_interface.get_signing_serializer(app_module.app)
+
+    def _cookie(self, **values):
+        # Signed like a real login session, so no request is spent logging in
+        return {'Cookie': f'session={self._serializer.dumps(values)}'}
+
+    def user(self):
+        return self._cookie(_user_id=str(self.rng.randint(1, self.dataset['users'])), _fresh=True)
+
+    def book(self):
+        """POST that books 1-2 seats which are known to still be free"""
+        with self._lock:
+            if not self.showtime_ids:
+                raise click.ClickException('Ran out of free seats; seed more upcoming showtimes')
+            showtime_id = self.rng.choice(self.showtime_ids)
+            seats = self.free_seats[showtime_id]
+            taken = seats[:self.rng.randint(1, 2)]
+            del seats[:len(taken)]
+            if not seats:
+                self.showtime_ids.remove(showtime_id)
+        headers = dict(self.user(), Accept='application/json')
+        return 'POST', f'/book_seats/{showtime_id}', {'seats': [str(s) for s in taken]}, headers
+
+    def routes(self):
+        """(name, endpoint, request factory) for every benchmarked route"""
+        pick = self.rng.choice
+        return [
+            ('home', 'home', lambda: ('GET', '/home', None, self.user())),
+            ('movie', 'movie_details',
+             lambda: ('GET', f'/movie/{self.rng.randint(1, self.dataset["movies"])}', None, self.user())),
+            ('book_seats', 'book_seats', lambda: ('GET', f'/book_seats/{pick(self.showtime_ids)}', None, self.user())),
+            ('book_seats_post', 'book_seats', self.book),
+            ('my_bookings', 'my_bookings', lambda: ('GET', '/my_bookings', None, self.user())),
+            ('profile', 'profile', lambda: ('GET', '/profile', None, self.user())),
+            ('theatre_dashboard', 'theatre_dashboard',
+             lambda: ('GET', '/theatre', None, self._cookie(theatre_logged_in=self.rng.randint(1, self.dataset['theatres']),
+                                                            theatre_name='Benchmark'))),
+            ('admin_dashboard', 'admin_dashboard', lambda: ('GET', '/admin', None, self._cookie(admin_logged_in=True))),
+        ]
+
+
+class TestClientDriver:
+    """Sends requests in-process through Flask's test client"""
+    name = 'client'
+
+    def __init__(self, app):
+        self.client = app.test_client(use_cookies=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def send(self, method, path, data, headers):
+        response = self.client.open(path, method=method, data=data, headers=headers)
+        response.get_data()
+        return response.status_code
+
+
+class _QuietRequestHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HTTPDriver:
+    """Sends requests over HTTP to the app served by a threaded werkzeug server"""
+    name = 'http'
+
+    def __init__(self, app):
+        self.app = app
+        self.opener = urllib.request.build_opener(_NoRedirect)
+
+    def __enter__(self):
+        self.server = make_server('127.0.0.1', 0, self.app, threaded=True, request_handler=_QuietRequestHandler)
+        self.base_url = f'http://127.0.0.1:{self.server.server_port}'
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.thread.join()
+
+    def send(self, method, path, data, headers):
+        body = urllib.parse.urlencode(data, doseq=True).encode() if data else None
+        req = urllib.request.Request(self.base_url + path, data=body, headers=headers, method=method)
+        try:
+            with self.opener.open(req, timeout=60) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as exc:
+            exc.read()
+            return exc.code
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def run_route(driver, app_module, endpoint, make_request, requests, warmup, concurrency):
+    """Send `requests` requests for one route and summarise latency, throughput and queries"""
+    for _ in range(warmup):
+        driver.send(*make_request())
+    app_module.metrics.reset()
+
+    def timed(_):
+        request_args = make_request()
+        start = time.perf_counter()
+        status = driver.send(*request_args)
+        return (time.perf_counter() - start) * 1000, status
+
+    start = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            samples = list(pool.map(timed, range(requests)))
+    else:
+        samples = [timed(i) for i in range(requests)]
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(ms for ms, _ in samples)
+    stats = next((row for row in app_module.metrics.summary()['endpoints'] if row['endpoint'] == endpoint), None)
+    return {
+        'requests': requests,
+        'errors': sum(1 for _, status in samples if status >= 400),
+        'throughput_rps': round(requests / elapsed, 1) if elapsed else 0.0,
+        'mean_ms': round(sum(latencies) / len(latencies), 2),
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p95_ms': round(percentile(latencies, 95), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+        'max_ms': round(latencies[-1], 2),
+        'avg_queries': round(stats['avg_queries'], 1) if stats else None,
+        'max_queries': stats['max_queries'] if stats else None,
+    }
+
+
+def print_results(mode, results):
+    click.echo(f'\n{mode}')
+    click.echo(f'{"route":<20}{"req":>7}{"err":>6}{"rps":>9}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}{"queries":>9}')
+    for route, row in results.items():
+        queries = '-' if row['avg_queries'] is None else f'{row["avg_queries"]:g}'
+        click.echo(f'{route:<20}{row["requests"]:>7}{row["errors"]:>6}{row["throughput_rps"]:>9}'
+                   f'{row["p50_ms"]:>10}{row["p95_ms"]:>10}{row["p99_ms"]:>10}{queries:>9}')
+
+
+def compare(baseline, report, threshold):
+    """Print per-route changes against a baseline; returns the list of regressions"""
+    regressions = []
+    click.echo(f'\nCompared with {baseline.get("commit") or "baseline"} ({baseline["created_at"]})')
+    for mode, results in report['results'].items():
+        for route, row in results.items():
+            old = baseline.get('results', {}).get(mode, {}).get(route)
+            if not old:
+                continue
+            p95_change = (row['p95_ms'] - old['p95_ms']) / old['p95_ms'] if old['p95_ms'] else 0.0
+            rps_change = (row['throughput_rps'] - old['throughput_rps']) / old['throughput_rps'] if old['throughput_rps'] else 0.0
+            flags = []
+            if p95_change > threshold:
+                flags.append('p95')
+            if old.get('avg_queries') is not None and row['avg_queries'] is not None \
+                    and row['avg_queries'] > old['avg_queries'] * (1 + threshold):
+                flags.append('queries')
+            if flags:
+                regressions.append((mode, route, flags))
+            click.echo(f'{mode:<8}{route:<20}p95 {old["p95_ms"]:>8} -> {row["p95_ms"]:<8} ({p95_change:+.0%})  '
+                       f'rps {old["throughput_rps"]:>8} -> {row["throughput_rps"]:<8} ({rps_change:+.0%})  '
+                       f'queries {old.get("avg_queries")} -> {row["avg_queries"]}'
+                       + (f'  REGRESSION: {", ".join(flags)}' if flags else ''))
+    return regressions
+
+
+def measure_startup(db_path, runs):
+    """Cold starts in fresh interpreters: (seconds to import the app and run create_app, whole process)"""
+    code = ('import time; start = time.perf_counter(); import app; app.create_app(); '
+            'print(time.perf_counter() - start)')
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{db_path}', AUTO_MIGRATE='0')
+    app_times, process_times = [], []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True, env=env,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        process_times.append(time.perf_counter() - start)
+        app_times.append(float(result.stdout.split()[-1]))
+    return app_times, process_times
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+@click.command()
+@click.option('--db', 'db_path', default=os.path.join('instance', 'benchmark.db'), show_default=True,
+              help='SQLite file to seed and benchmark against.')
+@click.option('--reuse', is_flag=True, help='Benchmark an existing database from an earlier run instead of seeding.')
+@click.option('--movies', default=200, show_default=True)
+@click.option('--theatres', default=20, show_default=True)
+@click.option('--users', default=10000, show_default=True)
+@click.option('--showtimes-per-movie', default=10, show_default=True, help='Upcoming showtimes per movie.')
+@click.option('--bookings', default=200000, show_default=True, help='Bookings in the history, e.g. 2000000.')
+@click.option('--requests', 'requests_per_route', default=200, show_default=True, help='Measured requests per route.')
+@click.option('--warmup', default=10, show_default=True, help='Unmeasured requests per route before measuring.')
+@click.option('--concurrency', default=8, show_default=True, help='Concurrent clients in HTTP mode.')
+@click.option('--mode', type=click.Choice(['client', 'http', 'both']), default='both', show_default=True)
+@click.option('--route', 'only_routes', multiple=True, help='Only benchmark these routes (repeatable).')
+@click.option('--seed', default=42, show_default=True, help='Random seed for the dataset and request mix.')
+@click.option('--output', default=None, help='Where to write the JSON results (default benchmarks/<commit>.json).')
+@click.option('--compare', 'baseline_path', default=None, help='Baseline JSON to compare against.')
+@click.option('--threshold', default=0.2, show_default=True, help='p95 increase counted as a regression.')
+@click.option('--startup-runs', default=5, show_default=True, help='Cold starts to time (0 to skip).')
+@click.option('--startup-target', default=2.0, show_default=True, help='Median cold start allowed, in seconds.')
+def main(db_path, reuse, movies, theatres, users, showtimes_per_movie, bookings, requests_per_route, warmup,
+         concurrency, mode, only_routes, seed, output, baseline_path, threshold, startup_runs, startup_target):
+    db_path = os.path.abspath(db_path)
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    if not reuse:
+        for path in (db_path, db_path + '-wal', db_path + '-shm'):
+            if os.path.exists(path):
+                os.remove(path)
+    # Must be set before the app module creates its engine
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    import app as app_module
+
+    app = app_module.app
+    app.config['METRICS_ENABLED'] = True
+    app.config['METRICS_SAMPLE_RATE'] = 1.0
+    meta_path = db_path + '.json'
+
+    with app.app_context():
+        if reuse:
+            if not os.path.exists(meta_path):
+                raise click.UsageError(f'{db_path} has no dataset description; run once without --reuse first')
+            with open(meta_path) as f:
+                dataset = json.load(f)
+            app_module.init_database()
+            free_seats = load_free_seats(app_module)
+            click.echo(f'Reusing {db_path}')
+        else:
+            click.echo(f'Seeding {db_path} ...')
+            start = time.perf_counter()
+            dataset, free_seats = seed_database(app_module, movies, theatres, users, showtimes_per_movie, bookings, seed)
+            dataset['seed_seconds'] = round(time.perf_counter() - start, 1)
+            with open(meta_path, 'w') as f:
+                json.dump(dataset, f, indent=2)
+        click.echo('Dataset: ' + ', '.join(f'{key}={value}' for key, value in dataset.items()))
+
+    scenario = Scenario(app_module, dataset, free_seats, seed)
+    routes = [route for route in scenario.routes() if not only_routes or route[0] in only_routes]
+    drivers = {'client': [TestClientDriver], 'http': [HTTPDriver], 'both': [TestClientDriver, HTTPDriver]}[mode]
+    report = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'dataset': dataset,
+        'settings': {'requests': requests_per_route, 'warmup': warmup, 'concurrency': concurrency},
+        'results': {},
+    }
+    for driver_class in drivers:
+        with driver_class(app) as driver:
+            # The test client is measured one request at a time, HTTP with concurrent clients
+            clients = concurrency if driver.name == 'http' else 1
+            results = report['results'][driver.name] = {}
+            for name, endpoint, make_request in routes:
+                results[name] = run_route(driver, app_module, endpoint, make_request, requests_per_route, warmup, clients)
+            print_results(f'{driver.name} (concurrency {clients})', results)
+
+    slow_startup = False
+    if startup_runs:
+        app_times, process_times = measure_startup(db_path, startup_runs)
+        report['startup'] = {'runs': startup_runs, 'target_s': startup_target,
+                             'create_app_p50_s': round(percentile(sorted(app_times), 50), 3),
+                             'process_p50_s': round(percentile(sorted(process_times), 50), 3),
+                             'process_max_s': round(max(process_times), 3)}
+        slow_startup = report['startup']['process_p50_s'] > startup_target
+        click.echo(f'\nstartup: import + create_app p50 {report["startup"]["create_app_p50_s"]}s, '
+                   f'process p50 {report["startup"]["process_p50_s"]}s (target {startup_target}s)'
+                   + ('  OVER TARGET' if slow_startup else ''))
+
+    output = output or os.path.join('benchmarks', f'{report["commit"] or "results"}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    click.echo(f'\nResults written to {output}')
+
+    if baseline_path:
+        with open(baseline_path) as f:
+            regressions = compare(json.load(f), report, threshold)
+        if regressions:
+            click.echo(f'{len(regressions)} regression(s) over {threshold:.0%}')
+            sys.exit(1)
+    if slow_startup:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
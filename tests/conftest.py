@@ -0,0 +1,71 @@
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+import pytest
+
+# app reads its settings at import time, so point it at a scratch database first
+_db_dir = tempfile.mkdtemp(prefix='cinebook-tests-')
+DB_PATH = os.path.join(_db_dir, 'test.db')
+os.environ['DATABASE_URL'] = f'sqlite:///{DB_PATH}'
+os.environ['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:1000'  # fast hashes; tests don't need the real cost
+
+import app as cinebook  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    """The app on a freshly migrated database, with per-process caches emptied"""
+    cinebook.app.config['TESTING'] = True
+    with cinebook.app.app_context():
+        cinebook.db.engine.dispose()
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(DB_PATH + suffix):
+            os.remove(DB_PATH + suffix)
+    cinebook.init_database()
+    cinebook.catalogue_cache.clear()
+    cinebook.identity_cache.clear()
+    cinebook.metrics.reset()
+    with cinebook.app.app_context():
+        yield cinebook.app
+        cinebook.db.session.remove()
+
+
+def add_user(email):
+    user = cinebook.User(email=email, password=cinebook.password_hasher.hash('secret'))
+    cinebook.db.session.add(user)
+    cinebook.db.session.commit()
+    return user.id
+
+
+def add_theatre(name):
+    theatre = cinebook.Theatre(name=name, location='Main Street', owner_name='Owner', email=f'{name.lower()}@theatre.test',
+                               password=cinebook.password_hasher.hash('secret'), phone='1')
+    cinebook.db.session.add(theatre)
+    cinebook.db.session.commit()
+    return theatre.id
+
+
+def add_movie(title):
+    movie = cinebook.Movie(title=title, director='Director', release_year=2020, genre='Drama', rating=7.5,
+                           runtime=120, poster_url='poster.jpg')
+    cinebook.db.session.add(movie)
+    cinebook.db.session.commit()
+    return movie.id
+
+
+def add_showtime(movie_id, theatre_id, days_ahead=1, hour=18, screen='Screen 1', total_seats=40):
+    show_day = datetime.now() + timedelta(days=days_ahead)
+    showtime = cinebook.Showtime(movie_id=movie_id, theatre_id=theatre_id, show_date=show_day.strftime('%Y-%m-%d'),
+                                 show_time=f'{hour}:00', screen=screen, total_seats=total_seats)
+    cinebook.db.session.add(showtime)
+    cinebook.db.session.commit()
+    return showtime.id
+
+
+def logged_in_client(app, user_id):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+    return client
@@ -0,0 +1,19 @@
+import app as cinebook
+from conftest import add_movie, add_showtime, add_theatre, add_user
+
+
+def test_archiving_twice_survives_reused_booking_ids(app):
+    # SQLite hands the highest booking id out again once that booking has been archived
+    user_id = add_user('regular@gmail.com')
+    showtime = cinebook.db.session.get(cinebook.Showtime, add_showtime(add_movie('Matinee'), add_theatre('Plaza'),
+                                                                         days_ahead=-1))
+    first = cinebook.reserve_seats(showtime, user_id, [1])
+    assert cinebook.archive_bookings(0) == 1
+    second = cinebook.reserve_seats(showtime, user_id, [2])
+    assert second.id == first.id
+    assert cinebook.archive_bookings(0) == 1
+
+    archive = cinebook.BookingArchive
+    archived = cinebook.db.session.execute(cinebook.db.select(archive.booking_id, archive.seats).order_by(archive.id)).all()
+    assert [tuple(row) for row in archived] == [(first.id, '1'), (first.id, '2')]
+    assert cinebook.Booking.query.count() == 0
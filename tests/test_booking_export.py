@@ -0,0 +1,19 @@
+from datetime import datetime
+
+import app as cinebook
+from conftest import add_movie, add_showtime, add_theatre, add_user
+
+
+def test_export_dates_include_midnight_on_the_first_day_only(app):
+    user_id = add_user('regular@gmail.com')
+    showtime = cinebook.db.session.get(cinebook.Showtime, add_showtime(add_movie('Matinee'), add_theatre('Plaza')))
+    at_start = cinebook.reserve_seats(showtime, user_id, [1])
+    after_end = cinebook.reserve_seats(showtime, user_id, [2])
+    # booking_time is written by CURRENT_TIMESTAMP as text, so set it the same way
+    for booking, stamp in ((at_start, '2026-08-01 00:00:00'), (after_end, '2026-08-02 00:00:00')):
+        cinebook.db.session.execute(cinebook.db.text('UPDATE booking SET booking_time = :stamp WHERE id = :id'),
+                                    {'stamp': stamp, 'id': booking.id})
+    cinebook.db.session.commit()
+
+    query = cinebook.booking_export_query(start=datetime(2026, 8, 1), end=datetime(2026, 8, 2))
+    assert [row.booking_id for row in cinebook.db.session.execute(query)] == [at_start.id]
@@ -0,0 +1,53 @@
+import random
+import threading
+from collections import Counter
+
+import app as cinebook
+from conftest import add_movie, add_showtime, add_theatre, add_user, logged_in_client
+
+THREADS = 20
+POSTS_PER_THREAD = 15
+TOTAL_SEATS = 40
+
+
+def test_concurrent_bookings_never_double_sell_a_seat(app):
+    showtime_id = add_showtime(add_movie('Opening Night'), add_theatre('Plaza'), total_seats=TOTAL_SEATS)
+    user_ids = [add_user(f'buyer{i}@gmail.com') for i in range(THREADS)]
+    statuses = Counter()
+    errors = []
+    start = threading.Barrier(THREADS)
+
+    def buyer(user_id, seed):
+        rng = random.Random(seed)
+        client = logged_in_client(app, user_id)
+        start.wait()
+        for _ in range(POSTS_PER_THREAD):
+            seats = rng.sample(range(1, TOTAL_SEATS + 1), rng.randint(1, 3))
+            try:
+                response = client.post(f'/book_seats/{showtime_id}', data={'seats': seats},
+                                       headers={'Accept': 'application/json'})
+                statuses[response.status_code] += 1
+            except Exception as e:  # surfaced below; an exception would otherwise kill the thread quietly
+                errors.append(e)
+
+    threads = [threading.Thread(target=buyer, args=(user_id, index)) for index, user_id in enumerate(user_ids)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert sum(statuses.values()) == THREADS * POSTS_PER_THREAD
+    assert set(statuses) <= {200, 409}, statuses
+    assert statuses[200] > 0
+
+    cinebook.db.session.expire_all()
+    seat_rows = [seat for (seat,) in cinebook.db.session.query(cinebook.BookingSeat.seat_number)
+                 .filter_by(showtime_id=showtime_id)]
+    assert len(seat_rows) == len(set(seat_rows)), 'a seat was sold twice'
+    booked_seats = [int(seat) for (seats,) in cinebook.db.session.query(cinebook.Booking.seats)
+                    .filter_by(showtime_id=showtime_id) for seat in seats.split(',')]
+    assert sorted(booked_seats) == sorted(seat_rows)
+    assert statuses[200] == cinebook.Booking.query.filter_by(showtime_id=showtime_id).count()
+    seat_map = cinebook.db.session.get(cinebook.Showtime, showtime_id).get_seat_map()
+    assert set(seat_map) == set(seat_rows)
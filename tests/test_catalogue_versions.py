@@ -0,0 +1,33 @@
+from sqlalchemy.exc import OperationalError
+
+import app as cinebook
+from conftest import add_movie, add_showtime, add_theatre, add_user
+
+
+def movie_version(movie_id):
+    return cinebook.db.session.scalar(cinebook.db.select(cinebook.CatalogueVersion.version)
+                                      .where(cinebook.CatalogueVersion.key == f'movie:{movie_id}'))
+
+
+def test_booking_bumps_its_movie_version_in_the_same_commit(app, monkeypatch):
+    user_id, movie_id = add_user('regular@gmail.com'), add_movie('Matinee')
+    showtime = cinebook.db.session.get(cinebook.Showtime, add_showtime(movie_id, add_theatre('Plaza')))
+    commits = []
+    monkeypatch.setattr(cinebook.db.session, 'commit', lambda real=cinebook.db.session.commit: commits.append(real()))
+
+    booking = cinebook.reserve_seats(showtime, user_id, [1])
+    assert len(commits) == 1
+    assert movie_version(movie_id) == 1
+    cinebook.cancel_booking(booking)
+    cinebook.db.session.commit()
+    assert movie_version(movie_id) == 2
+
+
+def test_failed_version_bump_does_not_fail_the_write(app, monkeypatch, caplog):
+    def locked(key):
+        raise OperationalError('UPDATE catalogue_version', {}, Exception('database is locked'))
+
+    monkeypatch.setattr(cinebook, 'bump_catalogue_version', locked)
+    cinebook.invalidate_catalogue()
+    assert 'Catalogue version bump failed' in caplog.text
+    assert cinebook.db.session.execute(cinebook.db.select(1)).scalar() == 1  # session usable again
@@ -0,0 +1,20 @@
+import app as cinebook
+from conftest import add_movie, add_showtime, add_theatre, add_user
+
+
+def test_sales_totals_count_showtimes_without_a_start(app):
+    # the daily rollups skip showtimes whose date and time don't parse; the dashboard totals must not
+    user_id = add_user('regular@gmail.com')
+    movie_id, theatre_id = add_movie('Matinee'), add_theatre('Plaza')
+    dated = cinebook.db.session.get(cinebook.Showtime, add_showtime(movie_id, theatre_id))
+    undated = cinebook.Showtime(movie_id=movie_id, theatre_id=theatre_id, show_date='soon', show_time='later',
+                                screen='Screen 2', total_seats=10)
+    cinebook.db.session.add(undated)
+    cinebook.db.session.commit()
+    assert undated.starts_at is None
+
+    cinebook.reserve_seats(dated, user_id, [1])
+    cinebook.reserve_seats(undated, user_id, [1, 2])
+    expected = (2, 3, 3 * cinebook.TICKET_PRICE)
+    assert cinebook.sales_totals(cinebook.Showtime.theatre_id == theatre_id) == expected
+    assert cinebook.sales_totals() == expected
@@ -0,0 +1,18 @@
+import app as cinebook
+from conftest import add_user
+
+
+def test_locking_one_account_leaves_others_on_the_same_address_alone(app, monkeypatch):
+    monkeypatch.setattr(cinebook, 'ip_login_limiter', cinebook.RateLimiter(*app.config['LOGIN_LIMIT_PER_IP']))
+    monkeypatch.setattr(cinebook, 'account_login_limiter', cinebook.RateLimiter(*app.config['LOGIN_LIMIT_PER_ACCOUNT']))
+    add_user('victim@gmail.com')
+    add_user('colleague@gmail.com')
+    client = app.test_client()  # every request comes from the same address, as behind an office proxy
+
+    failures, _ = app.config['LOGIN_LIMIT_PER_ACCOUNT']
+    for _ in range(failures):
+        assert client.post('/login', data={'email': 'victim@gmail.com', 'password': 'wrong'}).status_code == 200
+    assert client.post('/login', data={'email': 'victim@gmail.com', 'password': 'secret'}).status_code == 429
+
+    response = client.post('/login', data={'email': 'colleague@gmail.com', 'password': 'secret'})
+    assert response.status_code == 302
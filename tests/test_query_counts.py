@@ -0,0 +1,43 @@
+import pytest
+
+import app as cinebook
+from conftest import add_movie, add_showtime, add_theatre, add_user, logged_in_client
+
+# Most statements each page may run, however many movies, showtimes and bookings there are
+MAX_QUERIES = {'home': 4, 'movie_details': 4, 'my_bookings': 3}
+
+
+def seed_catalogue(movies, bookings_per_user):
+    """movies movies, each on three theatres, and one user with bookings_per_user bookings"""
+    theatre_ids = [add_theatre(f'Theatre{movies}x{i}') for i in range(3)]
+    user_id = add_user(f'fan{movies}@gmail.com')
+    showtime_ids = []
+    for number in range(movies):
+        movie_id = add_movie(f'Movie {movies}-{number}')
+        for day, theatre_id in enumerate(theatre_ids, 1):
+            showtime_ids.append(add_showtime(movie_id, theatre_id, days_ahead=day))
+    for number in range(bookings_per_user):
+        showtime = cinebook.db.session.get(cinebook.Showtime, showtime_ids[number % len(showtime_ids)])
+        cinebook.reserve_seats(showtime, user_id, [number // len(showtime_ids) + 1])
+    return user_id, movie_id
+
+
+def count_queries(client, url, endpoint):
+    """Statements run for one request, as counted by the app's before_cursor_execute metrics hook"""
+    cinebook.catalogue_cache.clear()
+    cinebook.identity_cache.clear()
+    cinebook.metrics.reset()
+    assert client.get(url).status_code == 200
+    return cinebook.metrics.endpoints[endpoint]['max_queries']
+
+
+@pytest.mark.parametrize('endpoint', sorted(MAX_QUERIES))
+def test_page_query_count_does_not_grow_with_data(app, endpoint):
+    counts = []
+    for movies, bookings in ((3, 5), (30, 120)):
+        user_id, movie_id = seed_catalogue(movies, bookings)
+        client = logged_in_client(app, user_id)
+        url = {'home': '/home', 'movie_details': f'/movie/{movie_id}', 'my_bookings': '/my_bookings'}[endpoint]
+        counts.append(count_queries(client, url, endpoint))
+    assert counts[0] == counts[1], f'{endpoint} ran {counts[0]} queries for a small catalogue, {counts[1]} for a large one'
+    assert counts[1] <= MAX_QUERIES[endpoint]
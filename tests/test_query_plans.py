@@ -0,0 +1,47 @@
+from datetime import datetime
+
+import pytest
+
+from app import Booking, Showtime, _booking_time_bound, db, init_database
+
+MONTH_START, MONTH_END = datetime(2026, 8, 1), datetime(2026, 9, 1)
+
+# The hot lookups, shaped as the app runs them, and the index each one should use
+HOT_QUERIES = {
+    'screen_conflict': (
+        db.select(Showtime.id).where(Showtime.theatre_id == 1, Showtime.screen == 'Screen 1',
+                                     Showtime.starts_at < MONTH_END).order_by(Showtime.starts_at.desc()).limit(1),
+        'ix_showtime_screen_starts_at'),
+    'theatre_showtimes': (db.select(Showtime.id).where(Showtime.theatre_id == 1), 'ix_showtime_theatre_id'),
+    'movie_showtimes': (db.select(Showtime.id).where(Showtime.movie_id == 1, Showtime.starts_at >= MONTH_START),
+                        'ix_showtime_movie_id'),
+    'my_bookings_month': (
+        db.select(Booking.id).where(Booking.user_id == 1, Booking.booking_time >= _booking_time_bound(MONTH_START),
+                                    Booking.booking_time < _booking_time_bound(MONTH_END))
+        .order_by(Booking.booking_time.desc(), Booking.id.desc()).limit(51),
+        'ix_booking_user_id_booking_time'),
+    'my_bookings_page': (
+        db.select(Booking.id).where(Booking.user_id == 1).order_by(Booking.booking_time.desc(), Booking.id.desc()).limit(51),
+        'ix_booking_user_id_booking_time'),
+    'showtime_bookings': (db.select(Booking.id).where(Booking.showtime_id == 1), 'ix_booking_showtime_id'),
+}
+
+
+def query_plan(statement):
+    sql = str(statement.compile(db.engine, compile_kwargs={'literal_binds': True}))
+    return ' | '.join(row[-1] for row in db.session.execute(db.text(f'EXPLAIN QUERY PLAN {sql}')))
+
+
+@pytest.mark.parametrize('name', sorted(HOT_QUERIES))
+def test_hot_queries_use_their_index(app, name):
+    statement, index = HOT_QUERIES[name]
+    plan = query_plan(statement)
+    assert f'USING INDEX {index}' in plan or f'USING COVERING INDEX {index}' in plan, plan
+    assert 'USE TEMP B-TREE' not in plan, plan
+
+
+def test_migrations_create_the_indexes(app):
+    indexes = {row[0] for row in db.session.execute(db.text("SELECT name FROM sqlite_master WHERE type = 'index'"))}
+    assert {'ix_showtime_movie_id', 'ix_showtime_theatre_id', 'ix_showtime_starts_at', 'ix_showtime_screen_starts_at',
+            'ix_booking_showtime_id', 'ix_booking_booking_time', 'ix_booking_user_id_booking_time'} <= indexes
+    assert init_database() is False  # already current: running it again changes nothing
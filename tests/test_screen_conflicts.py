@@ -0,0 +1,41 @@
+from datetime import datetime, timedelta
+
+import app as cinebook
+from conftest import add_movie, add_showtime, add_theatre
+
+
+def admin_client(app):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['admin_logged_in'] = True
+    return client
+
+
+def test_admin_cannot_add_an_overlapping_showtime(app):
+    movie_id, theatre_id = add_movie('Matinee'), add_theatre('Plaza')
+    add_showtime(movie_id, theatre_id, hour=18)
+    show_date = (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d')
+    form = {'theatre_id': theatre_id, 'show_date': show_date, 'screen': 'Screen 1', 'total_seats': 40}
+    client = admin_client(app)
+    assert client.get(f'/admin/showtimes/{movie_id}').status_code == 200
+
+    client.post(f'/admin/showtimes/{movie_id}', data=dict(form, show_time='19:00'))
+    assert cinebook.Showtime.query.count() == 1
+    client.post(f'/admin/showtimes/{movie_id}', data=dict(form, show_time='20:30'))
+    assert cinebook.Showtime.query.filter_by(theatre_id=theatre_id, show_time='20:30').count() == 1
+
+
+def test_runtime_change_cannot_run_into_the_next_show(app):
+    movie_id, theatre_id = add_movie('Matinee'), add_theatre('Plaza')
+    add_showtime(movie_id, theatre_id, hour=18)
+    add_showtime(add_movie('Late Show'), theatre_id, hour=20)
+    form = {'title': 'Matinee', 'director': 'Director', 'release_year': 2020, 'genre': 'Drama', 'rating': 7.5,
+            'poster_url': 'poster.jpg'}
+    client = admin_client(app)
+
+    client.post(f'/admin/edit_movie/{movie_id}', data=dict(form, runtime=150))
+    cinebook.db.session.expire_all()
+    assert cinebook.db.session.get(cinebook.Movie, movie_id).runtime == 120
+    client.post(f'/admin/edit_movie/{movie_id}', data=dict(form, runtime=110))
+    cinebook.db.session.expire_all()
+    assert cinebook.db.session.get(cinebook.Movie, movie_id).runtime == 110
@@ -0,0 +1,18 @@
+import app as cinebook
+from conftest import add_movie, add_showtime, add_theatre, add_user
+
+
+def test_hold_sees_a_booking_committed_after_the_showtime_was_loaded(app):
+    user_id = add_user('regular@gmail.com')
+    showtime = cinebook.db.session.get(cinebook.Showtime, add_showtime(add_movie('Matinee'), add_theatre('Plaza')))
+    assert 3 not in showtime.get_seat_map()
+
+    # Another worker books seat 3 after this request loaded the showtime
+    booked = cinebook.SeatMap(showtime.total_seats)
+    booked.add(3)
+    with cinebook.db.engine.begin() as connection:
+        connection.execute(cinebook.Showtime.__table__.update().where(cinebook.Showtime.__table__.c.id == showtime.id)
+                           .values(seat_map=booked.to_bytes()))
+
+    held, taken, _ = cinebook.hold_seats(showtime, user_id, [2, 3])
+    assert (held, taken) == ([2], [3])
@@ -0,0 +1,50 @@
+import pytest
+
+import app as cinebook
+from app import SeatMap
+from conftest import add_movie, add_showtime, add_theatre, add_user
+
+
+@pytest.mark.parametrize('seat', [0, -1, 41])
+def test_add_rejects_seats_outside_the_screen(seat):
+    seat_map = SeatMap(40)
+    with pytest.raises(ValueError):
+        seat_map.add(seat)
+    assert list(seat_map) == []
+
+
+def test_add_and_discard_round_trip():
+    seat_map = SeatMap(40)
+    for seat in (1, 8, 9, 40):
+        seat_map.add(seat)
+    assert list(seat_map) == [1, 8, 9, 40]
+    seat_map.discard(8)
+    assert list(SeatMap(40, seat_map.to_bytes())) == [1, 9, 40]
+    assert seat_map.available_count() == 37
+
+
+def test_shrinking_the_screen_keeps_stored_bits():
+    seat_map = SeatMap(40)
+    seat_map.add(38)
+    smaller = SeatMap(30, seat_map.to_bytes())
+    assert list(smaller) == [] and smaller.available_count() == 30
+    smaller.add(2)  # a booking while the screen is smaller writes the map back
+    assert list(SeatMap(40, smaller.to_bytes())) == [2, 38]
+
+
+def test_total_seats_cannot_drop_below_a_booked_seat(app):
+    theatre_id = add_theatre('Plaza')
+    showtime_id = add_showtime(add_movie('Epic'), theatre_id, total_seats=40)
+    showtime = cinebook.db.session.get(cinebook.Showtime, showtime_id)
+    cinebook.reserve_seats(showtime, add_user('fan@gmail.com'), [38])
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['theatre_logged_in'] = theatre_id
+    form = {'movie_id': showtime.movie_id, 'show_date': showtime.show_date, 'show_time': showtime.show_time,
+            'screen': showtime.screen}
+    client.post(f'/theatre/edit_showtime/{showtime_id}', data=dict(form, total_seats=30))
+    cinebook.db.session.expire_all()
+    assert cinebook.db.session.get(cinebook.Showtime, showtime_id).total_seats == 40
+    client.post(f'/theatre/edit_showtime/{showtime_id}', data=dict(form, total_seats=38))
+    cinebook.db.session.expire_all()
+    assert cinebook.db.session.get(cinebook.Showtime, showtime_id).total_seats == 38